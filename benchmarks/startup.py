@@ -0,0 +1,72 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Startup time regression benchmark. Runs `ul --help` and `ul drive ls --help`
+in fresh interpreters and fails (exit status 1) if the median wall time of
+either exceeds its budget.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py -runs 20 -help-budget-ms 150
+
+Use `ul --profile-startup <command>` to see where the time goes.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+DEFAULT_RUNS = 10
+DEFAULT_HELP_BUDGET_MS = 200
+DEFAULT_DRIVE_LS_HELP_BUDGET_MS = 800
+
+
+def time_command(args: List[str], runs: int) -> float:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo_root, env.get("PYTHONPATH")]))
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "ulcli"] + args,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        samples.append(time.perf_counter() - start)
+
+    return statistics.median(samples) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="ulcli startup time benchmark")
+    parser.add_argument("-runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("-help-budget-ms", type=float, default=DEFAULT_HELP_BUDGET_MS)
+    parser.add_argument(
+        "-drive-ls-help-budget-ms", type=float, default=DEFAULT_DRIVE_LS_HELP_BUDGET_MS
+    )
+    parsed = parser.parse_args()
+
+    cases = [
+        (["--help"], parsed.help_budget_ms),
+        (["drive", "ls", "--help"], parsed.drive_ls_help_budget_ms),
+    ]
+
+    ok = True
+    for args, budget in cases:
+        median = time_command(args, parsed.runs)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        print(f"ul {' '.join(args): <20} median {median:7.1f} ms  budget {budget:7.1f} ms  {status}")
+        ok = ok and median <= budget
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
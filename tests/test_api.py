@@ -0,0 +1,47 @@
+# Copyright (c), CommunityLogiq Software
+
+import importlib.util
+import unittest
+
+from requests import HTTPError, Response
+
+if importlib.util.find_spec("ulsdk") is None:
+    raise unittest.SkipTest("ulsdk is not installed")
+
+from ulcli.commands.drive import api
+from ulcli.commands.drive.stats import TransferStats, configure_stats, get_stats
+
+
+def http_error(status: int) -> HTTPError:
+    r = Response()
+    r.status_code = status
+    return HTTPError(f"{status}", response=r)
+
+
+class CallTest(unittest.TestCase):
+    def setUp(self):
+        saved = get_stats()
+        self.addCleanup(configure_stats, saved)
+        self.stats = TransferStats()
+        configure_stats(self.stats)
+
+    def call(self, error: HTTPError):
+        def fn():
+            raise error
+
+        with self.assertRaises(HTTPError):
+            api._call("put_file_chunk", fn, idempotent=False)
+        return self.stats.summary()
+
+    def test_expected_no_content_is_not_a_failure(self):
+        # raised to the caller, which expects it, but counted as a success
+        summary = self.call(http_error(204))
+        self.assertEqual(summary["requests"], 1)
+        self.assertEqual(summary["failed_requests"], 0)
+
+    def test_errors_are_failures(self):
+        self.assertEqual(self.call(http_error(404))["failed_requests"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# Copyright (c), CommunityLogiq Software
+
+import importlib.util
+import io
+import json
+import unittest
+from unittest import mock
+
+if importlib.util.find_spec("ulsdk") is None:
+    raise unittest.SkipTest("ulsdk is not installed")
+
+from ulcli.commands.batch import Operation, read_manifest, run_batch
+
+DIR = "05000000-0000-0000-0000-000000000001"
+
+
+def manifest(*specs) -> io.StringIO:
+    return io.StringIO("".join(json.dumps(spec) + "\n" for spec in specs))
+
+
+class ManifestTest(unittest.TestCase):
+    def test_references_come_only_from_id_fields(self):
+        op = Operation(1, {"op": "cp", "source": "./${a}.csv", "dest": "${out}", "name": "${b}"})
+
+        self.assertEqual(op.references, {"out"})
+        self.assertEqual(op.after, {"out"})
+
+    def test_field_resolves_references(self):
+        op = Operation(1, {"op": "mkdir", "parent": "${out}", "name": "${out}"})
+        results = {"out": {"status": "ok", "entry_id": DIR}}
+
+        self.assertEqual(op.field("parent", results), DIR)
+        self.assertEqual(op.field("name", results), "${out}")
+
+    def test_field_requires_an_entry_id(self):
+        op = Operation(1, {"op": "rm", "target": "${out}"})
+
+        with self.assertRaises(ValueError):
+            op.field("target", {"out": {"status": "ok"}})
+
+    def test_rejects_after_that_is_not_a_list_of_ids(self):
+        for after in ["mkdir1", [1], {"a": 1}]:
+            with self.assertRaisesRegex(ValueError, "line 2"):
+                read_manifest(
+                    manifest(
+                        {"id": "mkdir1", "op": "mkdir", "parent": DIR, "name": "a"},
+                        {"op": "rm", "target": DIR, "after": after},
+                    )
+                )
+
+    def test_rejects_unknown_and_duplicate_operations(self):
+        with self.assertRaisesRegex(ValueError, "unknown op"):
+            read_manifest(manifest({"op": "chmod"}))
+        with self.assertRaisesRegex(ValueError, "Duplicate"):
+            read_manifest(manifest(*[{"id": "a", "op": "rm", "target": DIR}] * 2))
+        with self.assertRaisesRegex(ValueError, "unknown operations"):
+            read_manifest(manifest({"op": "rm", "target": DIR, "after": ["missing"]}))
+
+    def test_rejects_references_to_operations_without_an_entry(self):
+        with self.assertRaisesRegex(ValueError, "produce no entry id"):
+            read_manifest(
+                manifest(
+                    {"id": "gone", "op": "rm", "target": DIR},
+                    {"op": "mkdir", "parent": "${gone}", "name": "a"},
+                )
+            )
+
+
+class RunBatchTest(unittest.TestCase):
+    def run_ops(self, specs, failing=()):
+        ran = []
+
+        def run_operation(context, op, results, options):
+            ran.append(op.id)
+            if op.id in failing:
+                raise Exception("failed")
+            return {"entry_id": DIR} if op.op in ["mkdir", "cp"] else {}
+
+        out = io.StringIO()
+        with mock.patch("ulcli.commands.batch.run_operation", side_effect=run_operation):
+            results = run_batch(None, read_manifest(manifest(*specs)), 4, out)
+        return results, ran
+
+    def test_runs_dependencies_first(self):
+        results, ran = self.run_ops(
+            [
+                {"id": "cp", "op": "cp", "source": "a.csv", "dest": "${out}"},
+                {"id": "out", "op": "mkdir", "parent": DIR, "name": "out"},
+            ]
+        )
+
+        self.assertEqual(ran, ["out", "cp"])
+        self.assertEqual(results["cp"]["status"], "ok")
+
+    def test_skips_operations_after_a_failure(self):
+        # c depends on b, which depends on the failing a, and comes before b
+        results, ran = self.run_ops(
+            [
+                {"id": "a", "op": "rm", "target": DIR},
+                {"id": "c", "op": "rm", "target": DIR, "after": ["b"]},
+                {"id": "b", "op": "rm", "target": DIR, "after": ["a"]},
+            ],
+            failing={"a"},
+        )
+
+        self.assertEqual(ran, ["a"])
+        self.assertEqual(results["a"]["status"], "error")
+        for id in ["b", "c"]:
+            self.assertEqual(results[id]["status"], "skipped")
+            self.assertEqual(results[id]["error"], "a dependency did not succeed")
+
+    def test_reports_cycles(self):
+        results, ran = self.run_ops(
+            [
+                {"id": "a", "op": "rm", "target": DIR, "after": ["b"]},
+                {"id": "b", "op": "rm", "target": DIR, "after": ["a"]},
+                {"id": "c", "op": "rm", "target": DIR},
+            ]
+        )
+
+        self.assertEqual(ran, ["c"])
+        self.assertEqual(results["a"]["error"], "dependency cycle")
+        self.assertEqual(results["b"]["error"], "dependency cycle")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# Copyright (c), CommunityLogiq Software
+
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+import uuid
+from unittest import mock
+
+if importlib.util.find_spec("ulsdk") is None:
+    raise unittest.SkipTest("ulsdk is not installed")
+
+from ulsdk.types.fs import ListDirectory, ListFile
+from ulsdk.types.id import ObjectId
+
+from ulcli.commands.common import uuid_from_id
+from ulcli.commands.drive.cache import CachedEntry, CachedListing, CachedSlot, DriveCache
+
+ROOT = uuid.UUID("05000000-0000-0000-0000-000000000001")
+
+
+def slot(id: uuid.UUID, name: str, ty=ListFile) -> CachedSlot:
+    return CachedSlot(ObjectId.from_uuid(id), name, CachedEntry(ty.__new__(ty)), 10, 1000, 15)
+
+
+class DriveCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "drive.sqlite")
+
+    def cache(self, ttl: float, namespace: str = "prod/us") -> DriveCache:
+        return DriveCache(namespace, ttl, self.path)
+
+    def test_ttl_zero_reuses_nothing(self):
+        cache = self.cache(0)
+        child = uuid.uuid4()
+        cache.put_listing(str(ROOT), "", CachedListing([slot(child, "a")]))
+        cache.put_parent(child, ROOT)
+
+        self.assertIsNone(cache.get_listing(str(ROOT), ""))
+        self.assertIsNone(cache.get_parent(child))
+        # nothing was written for a later command with a TTL to pick up
+        self.assertIsNone(self.cache(60).get_listing(str(ROOT), ""))
+        self.assertIsNone(self.cache(60).get_parent(child))
+
+    def test_listings_round_trip_until_they_expire(self):
+        cache = self.cache(60)
+        file, dir = uuid.uuid4(), uuid.uuid4()
+        cache.put_listing(str(ROOT), "", CachedListing([slot(file, "a"), slot(dir, "d", ListDirectory)]))
+
+        listing = cache.get_listing(str(ROOT), "")
+        assert listing is not None
+        self.assertEqual([uuid_from_id(s.id) for s in listing.slots], [file, dir])
+        self.assertEqual([s.name for s in listing.slots], ["a", "d"])
+        self.assertIsInstance(listing.slots[0].entry.value, ListFile)
+        self.assertIsInstance(listing.slots[1].entry.value, ListDirectory)
+
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get_listing(str(ROOT), ""))
+
+    def test_namespaces_are_separate(self):
+        self.cache(60).put_parent(uuid.uuid4(), ROOT)
+        child = uuid.uuid4()
+        self.cache(60, "stage/us").put_parent(child, ROOT)
+
+        self.assertIsNone(self.cache(60).get_parent(child))
+        self.assertEqual(self.cache(60, "stage/us").get_parent(child), ROOT)
+
+    def test_invalidate_drops_listings_of_and_containing_an_entry(self):
+        cache = self.cache(60)
+        dir, other = uuid.uuid4(), uuid.uuid4()
+        cache.put_listing(str(ROOT), "", CachedListing([slot(dir, "d", ListDirectory)]))
+        cache.put_listing(str(dir), "", CachedListing([slot(uuid.uuid4(), "a")]))
+        cache.put_listing(str(other), "", CachedListing([slot(uuid.uuid4(), "b")]))
+        cache.put_listing(str(other), "x/*", CachedListing([slot(uuid.uuid4(), "c")]))
+        cache.put_parent(dir, ROOT)
+
+        cache.invalidate([dir])
+
+        self.assertIsNone(cache.get_listing(str(ROOT), ""))
+        self.assertIsNone(cache.get_listing(str(dir), ""))
+        self.assertIsNone(cache.get_parent(dir))
+        # nested path listings can't be attributed to a directory
+        self.assertIsNone(cache.get_listing(str(other), "x/*"))
+        self.assertIsNotNone(cache.get_listing(str(other), ""))
+
+    def test_subtotals_match_the_directory_time(self):
+        cache = self.cache(0)
+        dir = uuid.uuid4()
+        cache.put_subtotal(dir, 1000, 3, 1, 300)
+
+        self.assertEqual(cache.get_subtotal(dir, 1000), (3, 1, 300))
+        self.assertIsNone(cache.get_subtotal(dir, 2000))
+
+    def test_invalidate_drops_ancestor_subtotals(self):
+        cache = self.cache(0)
+        top, a, b, other = (uuid.uuid4() for _ in range(4))
+        cache.put_subtotal(top, 1, 3, 2, 300)
+        cache.put_subtotal(a, 1, 2, 1, 200, top)
+        cache.put_subtotal(b, 1, 1, 0, 100, a)
+        cache.put_subtotal(other, 1, 1, 0, 100, top)
+
+        cache.invalidate([b])
+
+        self.assertIsNone(cache.get_subtotal(b, 1))
+        self.assertIsNone(cache.get_subtotal(a, 1))
+        self.assertIsNone(cache.get_subtotal(top, 1))
+        self.assertEqual(cache.get_subtotal(other, 1), (1, 0, 100))
+
+    def test_subtotal_without_a_parent_keeps_the_recorded_one(self):
+        cache = self.cache(0)
+        top, a = uuid.uuid4(), uuid.uuid4()
+        cache.put_subtotal(top, 1, 1, 1, 100)
+        cache.put_subtotal(a, 1, 1, 0, 100, top)
+        # measured again as a starting point, whose parent du doesn't know
+        cache.put_subtotal(a, 2, 2, 0, 200)
+
+        cache.invalidate([a])
+
+        self.assertIsNone(cache.get_subtotal(top, 1))
+
+    def test_invalidate_follows_cached_parent_links(self):
+        cache = self.cache(60)
+        dir, file = uuid.uuid4(), uuid.uuid4()
+        cache.put_subtotal(dir, 1, 1, 0, 100)
+        cache.put_parent(file, dir)
+
+        cache.invalidate([file])
+
+        self.assertIsNone(cache.get_subtotal(dir, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
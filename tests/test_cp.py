@@ -0,0 +1,59 @@
+# Copyright (c), CommunityLogiq Software
+
+import importlib.util
+import io
+import threading
+import time
+import unittest
+
+if importlib.util.find_spec("ulsdk") is None:
+    raise unittest.SkipTest("ulsdk is not installed")
+
+from ulcli.commands.drive.cp import _send_chunks
+from ulcli.commands.drive.transfer import TransferOptions
+
+
+class SendChunksTest(unittest.TestCase):
+    def send_file(self, options: TransferOptions, chunks: int = 6):
+        lock = threading.Lock()
+        sent = []
+        state = {"active": 0, "most": 0}
+
+        def send(index: int, chunk: bytes, hash: str):
+            with lock:
+                state["active"] += 1
+                state["most"] = max(state["most"], state["active"])
+            time.sleep(0.01)
+            with lock:
+                state["active"] -= 1
+                sent.append((index, threading.current_thread().name))
+
+        _send_chunks(
+            io.BytesIO(b"x" * 10 * chunks),
+            10 * chunks,
+            10,
+            options,
+            lambda index, chunk: "",
+            send,
+            lambda index: 0,
+            lambda n: None,
+        )
+        self.assertEqual(sorted(index for index, _ in sent), list(range(chunks)))
+        return {thread for _, thread in sent}, state["most"]
+
+    def test_files_reuse_the_sending_threads(self):
+        for options in [TransferOptions(), TransferOptions(chunk_parallelism=3)]:
+            first, _ = self.send_file(options)
+            second, _ = self.send_file(options)
+            self.assertTrue(first & second)
+            self.assertNotIn(threading.current_thread().name, first)
+
+    def test_parallelism_is_bounded_per_file(self):
+        _, most = self.send_file(TransferOptions(jobs=4, chunk_parallelism=2), chunks=12)
+        self.assertLessEqual(most, 2)
+        _, most = self.send_file(TransferOptions())
+        self.assertEqual(most, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (c), CommunityLogiq Software
+
+import os
+import tempfile
+import unittest
+import uuid
+
+from ulcli.commands.drive.hashcache import HashCache, compute_digests
+
+CHUNK_SIZE = 4
+
+
+class HashCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache = HashCache(os.path.join(self.dir.name, "hashes.sqlite"))
+        self.path = os.path.join(self.dir.name, "data.bin")
+        self.write(b"0123456789")
+
+    def write(self, content: bytes, path=None):
+        with open(path or self.path, "wb") as f:
+            f.write(content)
+
+    def cache_current(self):
+        self.cache.store(self.path, compute_digests(self.path, CHUNK_SIZE))
+
+    def test_hit_while_unchanged(self):
+        self.cache_current()
+
+        digests = self.cache.lookup(self.path, CHUNK_SIZE)
+        self.assertEqual(digests, compute_digests(self.path, CHUNK_SIZE))
+        self.assertEqual(len(digests.chunks), 3)
+        self.assertEqual(self.cache.chunk_size(self.path), CHUNK_SIZE)
+
+    def test_miss_for_another_chunk_size(self):
+        self.cache_current()
+
+        self.assertIsNone(self.cache.lookup(self.path, CHUNK_SIZE * 2))
+
+    def test_miss_after_mtime_change(self):
+        self.cache_current()
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        self.assertIsNone(self.cache.lookup(self.path, CHUNK_SIZE))
+        self.assertIsNone(self.cache.chunk_size(self.path))
+
+    def test_miss_after_size_change(self):
+        self.cache_current()
+        st = os.stat(self.path)
+        self.write(b"01234567890")
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        self.assertIsNone(self.cache.lookup(self.path, CHUNK_SIZE))
+
+    def test_miss_after_inode_change(self):
+        self.cache_current()
+        st = os.stat(self.path)
+        replacement = os.path.join(self.dir.name, "replacement.bin")
+        self.write(b"abcdefghij", replacement)
+        os.utime(replacement, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(replacement, self.path)
+
+        self.assertNotEqual(os.stat(self.path).st_ino, st.st_ino)
+        self.assertIsNone(self.cache.lookup(self.path, CHUNK_SIZE))
+
+    def test_digests_rehashes_a_changed_file(self):
+        first = self.cache.digests(self.path, CHUNK_SIZE)
+        self.write(b"abcdefghijk")
+
+        second = self.cache.digests(self.path, CHUNK_SIZE)
+        self.assertNotEqual(first.digest, second.digest)
+        self.assertEqual(self.cache.lookup(self.path, CHUNK_SIZE), second)
+
+    def test_records_uploads(self):
+        parent = uuid.uuid4()
+        entry = uuid.uuid4()
+        digests = self.cache.digests(self.path, CHUNK_SIZE)
+        self.cache.record_upload(parent, "data.bin", entry, digests)
+
+        self.assertEqual(self.cache.uploaded(parent, "data.bin"), (entry, CHUNK_SIZE, digests.digest))
+        self.assertIsNone(self.cache.uploaded(parent, "other.bin"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (c), CommunityLogiq Software
+
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from ulcli.commands.drive.journal import (
+    UploadJournal,
+    journal_dir,
+    journaled_chunk_size,
+    prune_journals,
+)
+
+PARENT = uuid.UUID("05000000-0000-0000-0000-000000000001")
+ENTRY = uuid.UUID("05000000-0000-0000-0000-000000000002")
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.addCleanup(self.home.cleanup)
+        patcher = mock.patch.dict(os.environ, {"HOME": self.home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.source = os.path.join(self.home.name, "data.bin")
+        with open(self.source, "wb") as f:
+            f.write(b"x" * 1000)
+
+    def journals(self):
+        return sorted(os.listdir(journal_dir()))
+
+    def test_resumes_acknowledged_chunks(self):
+        journal = UploadJournal(self.source, PARENT, "data.bin", 100)
+        journal.begin(ENTRY)
+        journal.ack(0, "aa")
+        journal.ack(1, "bb")
+
+        resumed = UploadJournal(self.source, PARENT, "data.bin", 100)
+        self.assertEqual(resumed.entry_id(), ENTRY)
+        self.assertTrue(resumed.is_committed(0, "aa"))
+        self.assertTrue(resumed.is_committed(1, "bb"))
+        self.assertFalse(resumed.is_committed(1, "cc"))
+        self.assertFalse(resumed.is_committed(2, "aa"))
+        self.assertEqual(journaled_chunk_size(self.source, PARENT, "data.bin"), 100)
+
+    def test_ignores_a_truncated_ack(self):
+        journal = UploadJournal(self.source, PARENT, "data.bin", 100)
+        journal.begin(ENTRY)
+        journal.ack(0, "aa")
+        path = os.path.join(journal_dir(), self.journals()[0])
+        with open(path, "a") as f:
+            f.write('[1, "b')
+
+        resumed = UploadJournal(self.source, PARENT, "data.bin", 100)
+        self.assertEqual(resumed.entry_id(), ENTRY)
+        self.assertTrue(resumed.is_committed(0, "aa"))
+        self.assertFalse(resumed.is_committed(1, "bb"))
+
+    def test_starts_over_when_the_chunk_size_changes(self):
+        UploadJournal(self.source, PARENT, "data.bin", 100).begin(ENTRY)
+
+        resumed = UploadJournal(self.source, PARENT, "data.bin", 200)
+        self.assertIsNone(resumed.entry_id())
+
+    def test_starts_over_when_the_source_changes(self):
+        UploadJournal(self.source, PARENT, "data.bin", 100).begin(ENTRY)
+        with open(self.source, "ab") as f:
+            f.write(b"more")
+
+        self.assertIsNone(UploadJournal(self.source, PARENT, "data.bin", 100).entry_id())
+        self.assertIsNone(journaled_chunk_size(self.source, PARENT, "data.bin"))
+
+    def test_finish_removes_the_journal(self):
+        journal = UploadJournal(self.source, PARENT, "data.bin", 100)
+        journal.begin(ENTRY)
+        journal.finish()
+
+        self.assertEqual(self.journals(), [])
+        self.assertIsNone(UploadJournal(self.source, PARENT, "data.bin", 100).entry_id())
+
+    def test_prune_removes_only_stale_journals(self):
+        other = os.path.join(self.home.name, "other.bin")
+        with open(other, "wb") as f:
+            f.write(b"y" * 10)
+        UploadJournal(self.source, PARENT, "data.bin", 100).begin(ENTRY)
+        UploadJournal(other, PARENT, "other.bin", 100).begin(ENTRY)
+        unrelated = os.path.join(journal_dir(), "notes.txt")
+        with open(unrelated, "w") as f:
+            f.write("kept")
+
+        os.remove(other)
+        prune_journals()
+
+        self.assertEqual(len(self.journals()), 2)
+        self.assertTrue(os.path.exists(unrelated))
+        self.assertEqual(UploadJournal(self.source, PARENT, "data.bin", 100).entry_id(), ENTRY)
+
+    def test_prune_without_a_journal_directory(self):
+        prune_journals()
+        self.assertFalse(os.path.exists(journal_dir()))
+
+
+if __name__ == "__main__":
+    unittest.main()
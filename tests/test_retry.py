@@ -0,0 +1,143 @@
+# Copyright (c), CommunityLogiq Software
+
+import email.utils
+import time
+import unittest
+from typing import Dict, Optional
+from unittest import mock
+
+from requests import ConnectionError, ConnectTimeout, HTTPError, ReadTimeout, Response
+
+from ulcli.commands.drive import retry
+from ulcli.commands.drive.retry import (
+    MAX_ATTEMPTS,
+    MAX_RETRY_AFTER,
+    RetryBudget,
+    call_with_retry,
+    configure_budget,
+    is_retryable,
+    retry_after,
+)
+
+
+def response(status: int, headers: Optional[Dict[str, str]] = None) -> Response:
+    r = Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    return r
+
+
+def http_error(status: int, headers: Optional[Dict[str, str]] = None) -> HTTPError:
+    return HTTPError(f"{status}", response=response(status, headers))
+
+
+class ClassificationTest(unittest.TestCase):
+    def test_unprocessed_statuses_are_always_retried(self):
+        for status in [429, 503, 514]:
+            self.assertTrue(is_retryable(http_error(status), idempotent=False))
+            self.assertTrue(is_retryable(http_error(status), idempotent=True))
+
+    def test_transient_statuses_are_retried_only_when_idempotent(self):
+        for status in [500, 502, 504]:
+            self.assertFalse(is_retryable(http_error(status), idempotent=False))
+            self.assertTrue(is_retryable(http_error(status), idempotent=True))
+
+    def test_client_errors_are_not_retried(self):
+        for status in [400, 401, 403, 404, 409]:
+            self.assertFalse(is_retryable(http_error(status), idempotent=True))
+        self.assertFalse(is_retryable(HTTPError("no response"), idempotent=True))
+        self.assertFalse(is_retryable(ValueError("bad"), idempotent=True))
+
+    def test_connection_errors(self):
+        # a connection that was never made can't have been acted on
+        self.assertTrue(is_retryable(ConnectTimeout(), idempotent=False))
+        self.assertFalse(is_retryable(ConnectionError(), idempotent=False))
+        self.assertFalse(is_retryable(ReadTimeout(), idempotent=False))
+        self.assertTrue(is_retryable(ConnectionError(), idempotent=True))
+        self.assertTrue(is_retryable(ReadTimeout(), idempotent=True))
+
+    def test_retry_after(self):
+        self.assertIsNone(retry_after(None))
+        self.assertIsNone(retry_after(response(503)))
+        self.assertEqual(retry_after(response(503, {"Retry-After": "3"})), 3.0)
+        self.assertEqual(retry_after(response(503, {"Retry-After": "100000"})), MAX_RETRY_AFTER)
+        self.assertEqual(retry_after(response(503, {"Retry-After": "-5"})), 0.0)
+        self.assertIsNone(retry_after(response(503, {"Retry-After": "soon"})))
+
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        seconds = retry_after(response(503, {"Retry-After": date}))
+        assert seconds is not None
+        self.assertAlmostEqual(seconds, 60, delta=2)
+
+
+class BudgetTest(unittest.TestCase):
+    def test_budget_runs_out(self):
+        budget = RetryBudget(2)
+
+        self.assertTrue(budget.take())
+        self.assertTrue(budget.take())
+        self.assertFalse(budget.take())
+        self.assertEqual(budget.used(), 2)
+
+
+class CallWithRetryTest(unittest.TestCase):
+    def setUp(self):
+        saved = retry.get_budget()
+        self.addCleanup(configure_budget, saved)
+        patcher = mock.patch("time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def failing(self, errors):
+        calls = []
+
+        def fn():
+            calls.append(None)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "done"
+
+        return fn, calls
+
+    def test_retries_until_success(self):
+        configure_budget(RetryBudget(10))
+        fn, calls = self.failing([http_error(503), ConnectTimeout()])
+
+        self.assertEqual(call_with_retry("ls", fn, idempotent=False), "done")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(retry.get_budget().used(), 2)
+
+    def test_waits_at_least_retry_after(self):
+        configure_budget(RetryBudget(10))
+        fn, _ = self.failing([http_error(429, {"Retry-After": "7"})])
+
+        call_with_retry("ls", fn, idempotent=True)
+        self.assertGreaterEqual(self.sleep.call_args[0][0], 7)
+
+    def test_does_not_repeat_non_idempotent_calls_that_may_have_run(self):
+        configure_budget(RetryBudget(10))
+        fn, calls = self.failing([http_error(500)])
+
+        with self.assertRaises(HTTPError):
+            call_with_retry("create_entry", fn, idempotent=False)
+        self.assertEqual(len(calls), 1)
+
+    def test_stops_when_the_budget_is_spent(self):
+        configure_budget(RetryBudget(1))
+        fn, calls = self.failing([http_error(503)] * 3)
+
+        with self.assertRaises(HTTPError):
+            call_with_retry("ls", fn, idempotent=True)
+        self.assertEqual(len(calls), 2)
+
+    def test_stops_after_max_attempts(self):
+        configure_budget(RetryBudget(100))
+        fn, calls = self.failing([http_error(503)] * MAX_ATTEMPTS)
+
+        with self.assertRaises(HTTPError):
+            call_with_retry("ls", fn, idempotent=True)
+        self.assertEqual(len(calls), MAX_ATTEMPTS)
+
+
+if __name__ == "__main__":
+    unittest.main()
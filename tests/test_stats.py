@@ -0,0 +1,67 @@
+# Copyright (c), CommunityLogiq Software
+
+import io
+import unittest
+from unittest import mock
+
+from loguru import logger
+
+from ulcli.commands.drive.stats import Progress, TransferStats
+
+
+class ProgressLineTest(unittest.TestCase):
+    def test_eta_from_bytes(self):
+        stats = TransferStats()
+        stats.expect(3000)
+        stats.expect(1000)
+        with stats.file("a.csv", 3000):
+            stats.transferred(3000)
+
+        with mock.patch.object(stats, "elapsed", return_value=3.0):
+            line = stats.progress_line()
+        self.assertIn("1/2 files", line)
+        self.assertIn("ETA 00:00:01", line)
+
+    def test_eta_from_items_when_nothing_has_a_size(self):
+        stats = TransferStats()
+        for _ in range(4):
+            stats.expect(0)
+        for name in ["a", "b"]:
+            with stats.file(name, 0):
+                pass
+
+        with mock.patch.object(stats, "elapsed", return_value=10.0):
+            line = stats.progress_line()
+        self.assertIn("2/4 items", line)
+        self.assertIn("0.2 items/s", line)
+        self.assertIn("ETA 00:00:10", line)
+
+
+class Terminal(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+class ProgressTest(unittest.TestCase):
+    def test_log_records_are_written_above_the_line(self):
+        out = Terminal()
+        stats = TransferStats()
+        with Progress(stats, out) as progress:
+            progress._line = "progress"
+            logger.info("uploaded a.csv")
+        written = out.getvalue()
+
+        # the line is cleared before the record and drawn again after it
+        self.assertTrue(written.startswith("\r\x1b[K"))
+        self.assertRegex(written, r"uploaded a\.csv\S*\nprogress")
+        self.assertTrue(written.endswith("\r\x1b[K"))
+
+    def test_not_a_terminal(self):
+        out = io.StringIO()
+        with Progress(TransferStats(), out):
+            pass
+        self.assertEqual(out.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
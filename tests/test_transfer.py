@@ -0,0 +1,133 @@
+# Copyright (c), CommunityLogiq Software
+
+import threading
+import unittest
+from unittest import mock
+
+from ulcli.commands.drive import transfer
+from ulcli.commands.drive.transfer import (
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+    MAX_CHUNKS,
+    MIN_CHUNK_SIZE,
+    TARGET_CHUNK_SECONDS,
+    ByteBudget,
+    ThroughputMeter,
+    TransferOptions,
+    choose_chunk_size,
+    inflight_limit,
+    max_chunk_size,
+)
+
+MB = 1024 * 1024
+
+
+def is_power_of_two(n: int) -> bool:
+    return n > 0 and n & (n - 1) == 0
+
+
+class ChooseChunkSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.meter = ThroughputMeter()
+        patcher = mock.patch.object(transfer, "throughput", self.meter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def measure(self, rate: float):
+        # long enough that slow rates still make a full sample
+        self.meter.record(int(rate * 4), 4.0)
+
+    def test_explicit_size_wins(self):
+        self.measure(1000 * MB)
+        self.assertEqual(choose_chunk_size(10**12, TransferOptions(chunk_size=3 * MB)), 3 * MB)
+
+    def test_default_before_any_measurement(self):
+        self.assertTrue(is_power_of_two(DEFAULT_CHUNK_SIZE))
+        self.assertEqual(choose_chunk_size(10 * MB, TransferOptions()), DEFAULT_CHUNK_SIZE)
+
+    def test_sized_from_the_measured_rate(self):
+        self.measure(3 * MB)
+        size = choose_chunk_size(10 * MB, TransferOptions())
+        self.assertEqual(size, 16 * MB)
+        self.assertLessEqual(size, 3 * MB * TARGET_CHUNK_SECONDS)
+
+    def test_nearby_rates_give_the_same_size(self):
+        self.measure(3.5 * MB)
+        first = choose_chunk_size(10 * MB, TransferOptions())
+        self.measure(4.5 * MB)
+        self.assertEqual(choose_chunk_size(10 * MB, TransferOptions()), first)
+
+    def test_clamped_to_the_size_limits(self):
+        self.measure(0.5 * MB)
+        self.assertEqual(choose_chunk_size(10 * MB, TransferOptions()), MIN_CHUNK_SIZE)
+
+        self.meter = ThroughputMeter()
+        with mock.patch.object(transfer, "throughput", self.meter):
+            self.measure(10_000 * MB)
+            self.assertEqual(choose_chunk_size(10 * MB, TransferOptions()), MAX_CHUNK_SIZE)
+
+    def test_large_files_stay_under_max_chunks(self):
+        self.measure(MB)
+        file_size = 2_000_000 * MB
+        size = choose_chunk_size(file_size, TransferOptions())
+        self.assertTrue(is_power_of_two(size))
+        self.assertLessEqual(file_size / size, MAX_CHUNKS)
+
+    def test_every_upload_fits_in_the_memory_budget(self):
+        options = TransferOptions(jobs=4, chunk_parallelism=2, memory=ByteBudget(100 * MB))
+        self.assertEqual(max_chunk_size(options), 100 * MB // 8)
+
+        size = choose_chunk_size(10**10, options)
+        self.assertTrue(is_power_of_two(size))
+        self.assertLessEqual(size * 8, 100 * MB)
+        self.assertIsNone(max_chunk_size(TransferOptions()))
+
+    def test_inflight_limit(self):
+        self.assertEqual(inflight_limit(MB, TransferOptions()), 2 * MB)
+        self.assertEqual(inflight_limit(MB, TransferOptions(chunk_parallelism=4)), 4 * MB)
+        self.assertEqual(inflight_limit(MB, TransferOptions(chunk_parallelism=4, max_inflight=MB // 2)), MB)
+
+
+class ThroughputMeterTest(unittest.TestCase):
+    def test_ignores_small_samples(self):
+        meter = ThroughputMeter()
+        meter.record(1000, 0.001)
+        self.assertIsNone(meter.rate())
+
+    def test_moving_average(self):
+        meter = ThroughputMeter()
+        meter.record(10 * MB, 1.0)
+        meter.record(20 * MB, 1.0)
+        self.assertAlmostEqual(meter.rate(), 10 * MB + ThroughputMeter.WEIGHT * 10 * MB)
+
+
+class ByteBudgetTest(unittest.TestCase):
+    def test_refuses_requests_larger_than_the_limit(self):
+        budget = ByteBudget(10)
+        with self.assertRaises(ValueError):
+            budget.acquire(11)
+        self.assertEqual(budget.acquire(10), 10)
+
+    def test_blocks_until_released(self):
+        budget = ByteBudget(10)
+        budget.acquire(8)
+        acquired = threading.Event()
+
+        def acquire():
+            budget.acquire(5)
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        budget.release(8)
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_limit_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            ByteBudget(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
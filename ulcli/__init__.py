@@ -1,72 +1,70 @@
 # Copyright (c), CommunityLogiq Software
 
-import os
 import sys
-import inspect
-import importlib.util
-from loguru import logger
-from pathlib import Path
+import importlib
 from types import ModuleType
-from typing import NamedTuple, List, Dict, Any, Union
-
-import ulcli.commands
-from ulcli.internal import Console
-import ulcli.cmdparser
-
-
-modules = []
+from typing import NamedTuple, Dict
 
 
 class Command(NamedTuple):
-    module: ModuleType
+    # dotted path of the module defining the command; it is only imported when
+    # the command is run
+    module: str
     ty: str
     help: str
 
 
-def register_module(module):
+# Static registry of the built in commands, so that `ul --help` and dispatch
+# don't have to import (and instantiate) every command module up front.
+builtin_commands: Dict[str, Command] = {
+    "batch": Command(
+        "ulcli.commands.batch", "Batch", "run a manifest of drive operations concurrently"
+    ),
+    "drive": Command("ulcli.commands.drive.cmd", "Drive", "Drive commands"),
+    "keys": Command("ulcli.commands.keys", "Keys", "manage API keys"),
+    "shell": Command("ulcli.commands.shell", "Shell", "run many commands in one process"),
+}
+
+modules = []
+
+
+def register_module(module: ModuleType):
     global modules
     modules.append(module)
 
 
-def _get_command_list() -> List[Command]:
+def _get_registered_commands() -> Dict[str, Command]:
     global modules
 
-    module_commands = []
+    mapping = dict()
+    if len(modules) == 0:
+        return mapping
+
+    import inspect
+
     for mod in modules:
         raw = inspect.getmembers(mod, inspect.isclass)
         for element in raw:
             element_name = element[0]
             if element_name != "UlcliCommand":
-                help = ""
-                try:
-                    target = getattr(mod, element_name)
-                    help = target.__help__
-                except:
-                    pass
-
-                module_commands.append(Command(mod, element_name, help))
+                target = getattr(mod, element_name)
+                help = getattr(target, "__help__", "")
+                name = str(target())
+                mapping[name] = Command(mod.__name__, element_name, help)
 
-    return module_commands
+    return mapping
 
 
 def _instantiate_module(command: Command):
-    target = getattr(command.module, command.ty)
+    module = importlib.import_module(command.module)
+    target = getattr(module, command.ty)
     instance = target()
     return instance
 
 
-def _get_command_name(command: Command) -> str:
-    target = getattr(command.module, command.ty)
-    instance = target()
-    return str(instance)
-
-
 def _get_command_to_module_mapping() -> Dict[str, Command]:
-    mapping = dict()
-    commands = _get_command_list()
-    for command in commands:
-        name = _get_command_name(command)
-        mapping[name] = command
+    mapping = dict(builtin_commands)
+    mapping.update(_get_registered_commands())
     return mapping
 
 
@@ -87,7 +85,14 @@ def _print_help():
 
 
 def main():
-    register_module(ulcli.commands)
+    # hidden flag: report where startup time goes before running the command
+    profiler = None
+    if "--profile-startup" in sys.argv:
+        from ulcli.internal.profiler import StartupProfiler
+
+        sys.argv.remove("--profile-startup")
+        profiler = StartupProfiler()
+        profiler.install()
 
     if len(sys.argv) < 2:
         _print_help()
@@ -98,13 +103,30 @@ def main():
         _print_help()
         return 0
 
-    mapping = _get_command_to_module_mapping()
+    with _profile_stage(profiler, "command registry"):
+        mapping = _get_command_to_module_mapping()
     if command not in mapping:
         print('ERROR: Command "%s" not recognized. Try "ulcli --help".' % (command))
         return -1
 
-    instance = _instantiate_module(mapping[command])
+    with _profile_stage(profiler, f"load command {command}"):
+        instance = _instantiate_module(mapping[command])
+
+    if profiler is not None:
+        # subcommands and their dependencies are imported lazily from run(),
+        # so keep recording imports and report once the process is done
+        import atexit
+
+        atexit.register(profiler.report)
+        profiler.mark_run()
+
     if not instance.run():
         return -1
 
     return 0
+
+
+def _profile_stage(profiler, name: str):
+    from contextlib import nullcontext
+
+    return profiler.stage(name) if profiler is not None else nullcontext()
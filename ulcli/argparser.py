@@ -7,26 +7,70 @@ in order to add support for common environment related arguments, such as
 """
 
 import argparse
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
 
 envs = ["stage", "prod", "local"]
 regions = ["ca", "us"]
 
+# destinations of the arguments every ArgumentParser has, and of the drive
+# arguments (added by add_retry_arguments and add_trace_arguments) that
+# `ul shell` passes on to the commands it runs
+COMMON_ARGUMENTS = ["region", "env", "profile", "retry_budget", "trace"]
+
+_defaults: Dict[str, Any] = {}
+
+
+@contextmanager
+def common_defaults(values: Dict[str, Any]) -> Iterator[None]:
+    """
+    Use values (keyed by COMMON_ARGUMENTS names) as the defaults of the common
+    arguments of parsers made in this block, so that commands run by another
+    command in the same process (e.g. by `ul shell`) inherit its settings.
+    """
+    global _defaults
+    saved = _defaults
+    _defaults = {**saved, **{name: value for name, value in values.items() if value is not None}}
+    try:
+        yield
+    finally:
+        _defaults = saved
+
+
+def common_default(name: str, default: Any = None) -> Any:
+    """The default of the argument with destination name in parsers made now"""
+    return _defaults.get(name, default)
+
 
 class ArgumentParser(argparse.ArgumentParser):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._inherited = dict(_defaults)
         self.add_argument(
             "-region",
             help=f"Specify the region in which to deploy pipeline: {','.join(regions)}",
             choices=regions,
+            default=_defaults.get("region"),
         )
         self.add_argument(
             "-env",
             help=f"the environment {','.join(envs)} in which to deploy the pipeline",
             choices=envs,
+            default=_defaults.get("env"),
         )
         self.add_argument(
             "-profile",
             required=False,
             help="the profile you wish to use if not using the regular us/ca",
+            default=_defaults.get("profile"),
         )
+
+    def parse_known_args(self, args=None, namespace=None):
+        parsed, extras = super().parse_known_args(args, namespace)
+        # an explicit -region wins over an inherited profile, as it does over
+        # UL_PROFILE
+        inherited = self._inherited.get("profile")
+        region_given = parsed.region != self._inherited.get("region")
+        if inherited is not None and parsed.profile == inherited and region_given:
+            parsed.profile = None
+        return parsed, extras
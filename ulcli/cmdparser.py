@@ -1,6 +1,11 @@
 # Copyright (c), CommunityLogiq Software
 
-from typing import Callable, List, Optional
+import importlib
+from typing import Callable, List, Optional, Union
+
+# A command handler, or the "package.module:function" path of one. Handlers
+# given as paths are only imported when their command is dispatched.
+Handler = Union[Callable[[List[str]], bool], str]
 
 
 class UnsupportedArgException(Exception):
@@ -12,7 +17,7 @@ class ArgTuple:
         self,
         arg: str,
         helpstr: str,
-        fn: Callable[[List[str]], bool],
+        fn: Handler,
         aliases: List[str],
     ):
         self.arg = arg
@@ -20,6 +25,12 @@ class ArgTuple:
         self.fn = fn
         self.aliases = aliases
 
+    def resolve(self) -> Callable[[List[str]], bool]:
+        if isinstance(self.fn, str):
+            module, _, name = self.fn.partition(":")
+            self.fn = getattr(importlib.import_module(module), name)
+        return self.fn
+
 
 class CmdParser:
     def __init__(self, module: str, module_help: Optional[str] = None):
@@ -31,7 +42,7 @@ class CmdParser:
         self,
         arg: str,
         helpstr: str,
-        fn: Callable[[List[str]], bool],
+        fn: Handler,
         aliases: List[str] = list(),
     ):
         arg_tuple = ArgTuple(arg, helpstr, fn, aliases)
@@ -81,6 +92,6 @@ class CmdParser:
 
         for arg_tuple in self.supported_cmds:
             if self.command == arg_tuple.arg or self.command in arg_tuple.aliases:
-                return arg_tuple.fn(self.rest)
+                return arg_tuple.resolve()(self.rest)
 
         raise UnsupportedArgException()
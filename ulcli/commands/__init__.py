@@ -3,5 +3,25 @@
 # flake8: noqa: F401
 
 from .command import UlcliCommand
-from .keys import Keys
-from .drive.cmd import Drive
+
+
+# The command classes are imported on first access so that importing
+# ulcli.commands doesn't pull in every command's dependencies.
+def __getattr__(name: str):
+    if name == "Keys":
+        from .keys import Keys
+
+        return Keys
+    if name == "Drive":
+        from .drive.cmd import Drive
+
+        return Drive
+    if name == "Batch":
+        from .batch import Batch
+
+        return Batch
+    if name == "Shell":
+        from .shell import Shell
+
+        return Shell
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,287 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, TextIO
+
+from loguru import logger
+
+import ulcli.argparser
+from ulcli.commands.command import UlcliCommand
+from ulcli.commands.common import uuid_from_id
+from ulcli.internal.console import Console
+from ulsdk.request_context import RequestContext
+from ulsdk.types.id import ObjectId
+
+from ulcli.commands.drive.api import get_drive_context, create_entry, ls, unlink
+from ulcli.commands.drive.cache import add_cache_arguments
+from ulcli.commands.drive.retry import add_retry_arguments
+from ulcli.commands.drive.tracing import add_trace_arguments
+from ulcli.commands.drive.cp import LocalEntry, put_file
+from ulcli.commands.drive.move import do_move
+from ulcli.commands.drive.transfer import TransferOptions
+
+OPS = ["mkdir", "cp", "mv", "rm"]
+
+# the fields of each op that hold drive ids, and so may refer to other operations
+ID_FIELDS = {
+    "mkdir": ["parent"],
+    "cp": ["dest"],
+    "mv": ["source", "target"],
+    "rm": ["target"],
+}
+
+# the ops whose result has an entry id that other operations can refer to
+ENTRY_OPS = ["mkdir", "cp"]
+
+# "${<id>}" in an id field is replaced by the entry id produced by that operation
+REFERENCE = re.compile(r"\$\{([^}]+)\}")
+
+
+class Operation:
+    def __init__(self, line_no: int, spec: Dict[str, Any]):
+        self.spec = spec
+        self.id = str(spec.get("id", f"line:{line_no}"))
+        self.op = spec.get("op")
+        if self.op not in OPS:
+            raise ValueError(f"line {line_no}: unknown op {self.op!r}; expected one of {', '.join(OPS)}")
+
+        after = spec.get("after", [])
+        if not isinstance(after, list) or not all(isinstance(dep, str) for dep in after):
+            raise ValueError(f'line {line_no}: "after" must be a list of operation ids')
+
+        self.references: Set[str] = set()
+        for name in ID_FIELDS[self.op]:
+            value = spec.get(name)
+            if isinstance(value, str):
+                self.references.update(REFERENCE.findall(value))
+        self.after: Set[str] = set(after) | self.references
+
+    def field(self, name: str, results: Dict[str, Dict[str, Any]], default: Any = None) -> Any:
+        value = self.spec.get(name, default)
+        if name not in ID_FIELDS[self.op] or not isinstance(value, str):
+            return value
+
+        def resolve(match: re.Match) -> str:
+            entry_id = results[match.group(1)].get("entry_id")
+            if entry_id is None:
+                raise ValueError(f"Operation {match.group(1)} referred to by {self.id} produced no entry id")
+            return entry_id
+
+        return REFERENCE.sub(resolve, value)
+
+
+def read_manifest(f: TextIO) -> List[Operation]:
+    ops = []
+    for line_no, line in enumerate(f, start=1):
+        if line.strip() == "":
+            continue
+        ops.append(Operation(line_no, json.loads(line)))
+
+    ids = set()
+    for op in ops:
+        if op.id in ids:
+            raise ValueError(f"Duplicate operation id {op.id}")
+        ids.add(op.id)
+
+    by_id = {op.id: op for op in ops}
+    for op in ops:
+        unknown = op.after - ids
+        if len(unknown) > 0:
+            raise ValueError(f"Operation {op.id} depends on unknown operations: {', '.join(sorted(unknown))}")
+        for ref in sorted(op.references):
+            if by_id[ref].op not in ENTRY_OPS:
+                raise ValueError(
+                    f"Operation {op.id} refers to {ref}, but {by_id[ref].op} operations produce no entry id"
+                )
+
+    return ops
+
+
+def do_mkdir(context: RequestContext, parent: str, name: str) -> Optional[uuid.UUID]:
+    try:
+        summary = create_entry(context, ObjectId.from_uuid(parent), name, "directory", "", 0)
+        return uuid_from_id(summary.id)
+    except ValueError as e:
+        if "already exists" not in e.args[0]:
+            raise e
+
+    for slot in ls(context, parent, name).slots:
+        if slot.name == name:
+            return uuid_from_id(slot.id)
+    raise Exception(f"{name} already exists in {parent} but was not in its listing")
+
+
+def run_operation(
+    context: RequestContext,
+    op: Operation,
+    results: Dict[str, Dict[str, Any]],
+    options: TransferOptions,
+) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    match op.op:
+        case "mkdir":
+            result["entry_id"] = str(do_mkdir(context, op.field("parent", results), op.field("name", results)))
+        case "cp":
+            source = LocalEntry(op.field("source", results))
+            name = op.field("name", results) or source.name()
+            with source.open() as f:
+                id = put_file(context, uuid.UUID(op.field("dest", results)), f, name, options)
+            result["entry_id"] = str(id)
+        case "mv":
+            summary = do_move(
+                context,
+                op.field("source", results),
+                op.field("target", results),
+                bool(op.field("overwrite", results, False)),
+            )
+            if len(summary.failed) > 0:
+                label, error = summary.failed[0]
+                raise Exception(f"Failed to move {len(summary.failed)} items; {label}: {error}")
+            result["moved"] = summary.moved
+        case "rm":
+            unlink(context, ObjectId.from_uuid(op.field("target", results)))
+    return result
+
+
+def run_batch(
+    context: RequestContext,
+    ops: List[Operation],
+    jobs: int,
+    out: TextIO,
+    options: TransferOptions = TransferOptions(),
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs ops on a pool of jobs workers, starting each one once the operations
+    it depends on have succeeded. Operations whose dependencies failed are
+    skipped. One JSON result per operation is written to out as it finishes.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    lock = threading.Lock()
+    waiting = {op.id: op for op in ops}
+
+    def record(op: Operation, result: Dict[str, Any]):
+        result = {"id": op.id, "op": op.op, **result}
+        with lock:
+            results[op.id] = result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+    def execute(op: Operation):
+        start = time.perf_counter()
+        try:
+            result = run_operation(context, op, results, options)
+            result["status"] = "ok"
+        except Exception as e:
+            logger.error(f"Operation {op.id} ({op.op}) failed: {e}")
+            result = {"status": "error", "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        record(op, result)
+
+    running: Dict[Future, Operation] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(waiting) > 0 or len(running) > 0:
+            # skipping an operation settles the ones that depend on it, which
+            # may come earlier in the manifest, so pass over the waiting
+            # operations until none of them changes
+            settled = True
+            while settled:
+                settled = False
+                for op in list(waiting.values()):
+                    statuses = [results[dep]["status"] for dep in op.after if dep in results]
+                    if any(status != "ok" for status in statuses):
+                        del waiting[op.id]
+                        record(op, {"status": "skipped", "error": "a dependency did not succeed"})
+                        settled = True
+                    elif len(statuses) == len(op.after):
+                        del waiting[op.id]
+                        running[pool.submit(execute, op)] = op
+
+            if len(running) == 0:
+                # nothing can make progress: the remaining operations form a cycle
+                for op in waiting.values():
+                    record(op, {"status": "skipped", "error": "dependency cycle"})
+                break
+
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+
+    return results
+
+
+class Batch(UlcliCommand):
+    __help__ = "run a manifest of drive operations concurrently"
+
+    def __init__(self):
+        super().__init__("batch")
+
+    def run(self):
+        epilog = """Each line of the manifest is a JSON object describing one operation:
+
+    {"id": "out", "op": "mkdir", "parent": "<dir id>", "name": "exports"}
+    {"op": "cp", "source": "./a.csv", "dest": "${out}", "name": "a.csv"}
+    {"op": "mv", "source": "<id or <dir id>/pattern>", "target": "<dir id>", "overwrite": false}
+    {"op": "rm", "target": "<id>"}
+
+mkdir succeeds if the directory already exists. "${<id>}" in a field holding a
+drive id (parent, dest, source of mv, target) is replaced by the entry id
+created by that mkdir or cp operation, which also makes this operation wait
+for it; "after": ["<id>", ...] adds explicit dependencies. Operations run
+concurrently once their dependencies have succeeded, and are skipped if one
+failed. A JSON result line is written for every operation.
+"""
+
+        parser = ulcli.argparser.ArgumentParser(
+            prog="ul batch",
+            description="Run a manifest of drive operations",
+            epilog=epilog,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        parser.add_argument(
+            "-j",
+            help="number of operations to run concurrently. Defaults to 8",
+            type=int,
+            default=8,
+        )
+        parser.add_argument(
+            "-results",
+            help="file to write per-operation results to. Defaults to stdout",
+            default=None,
+        )
+        parser.add_argument("manifest", help="JSON lines file of operations, or - for stdin")
+        add_cache_arguments(parser)
+        add_retry_arguments(parser)
+        add_trace_arguments(parser)
+        parsed = parser.parse_args(sys.argv[2:])
+
+        if parsed.j < 1:
+            raise Exception("-j must be at least 1")
+
+        if parsed.manifest == "-":
+            ops = read_manifest(sys.stdin)
+        else:
+            with open(parsed.manifest, "r") as f:
+                ops = read_manifest(f)
+
+        context = get_drive_context(parsed)
+
+        if parsed.results is None:
+            results = run_batch(context, ops, parsed.j, sys.stdout)
+        else:
+            with open(parsed.results, "w") as out:
+                results = run_batch(context, ops, parsed.j, out)
+
+        failed = [r for r in results.values() if r["status"] != "ok"]
+        if len(failed) > 0:
+            Console.error(f"{len(failed)} of {len(ops)} operations did not succeed")
+            return False
+
+        logger.info(f"Completed {len(ops)} operations")
+        return True
@@ -10,14 +10,14 @@ from ulsdk.types.id import (
     ObjectId,
     StreamId,
 )
-from typing import Union, Optional
+from typing import Dict, Union, Optional, Tuple
 from ulsdk.keys import Environment, load_key
 from ulsdk.api_key_context import ApiKeyContext
 import uuid
 import os
 
 
-def get_api_context(parsed):
+def get_env_and_profile(parsed) -> Tuple[Environment, str]:
     # prioritize passed env then env variable and then by default prod
     env_str = parsed.env or os.getenv("UL_ENV") or "prod"
     match env_str:
@@ -36,13 +36,30 @@ def get_api_context(parsed):
             "Profile is None, make sure to pass a profile or a region or have UL_PROFILE env variable set up"
         )
 
+    return (env, profile)
+
+
+# Contexts are kept for the life of the process, so that long running sessions
+# (e.g. `ul shell`) only load keys once per profile and environment.
+_contexts: Dict[Tuple[Environment, str], ApiKeyContext] = {}
+
+
+def get_api_context(parsed):
+    env, profile = get_env_and_profile(parsed)
+
+    context = _contexts.get((env, profile))
+    if context is not None:
+        return context
+
     key = load_key(profile)
     if key is None:
         raise Exception(
             "Unable to find API keys. Please run `ul keys install` to setup your API keys"
         )
 
-    return ApiKeyContext(key, env)
+    context = ApiKeyContext(key, env)
+    _contexts[(env, profile)] = context
+    return context
 
 
 def uuid_from_id(
@@ -0,0 +1,230 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+The drive API calls made by the drive commands. Every command goes through
+these wrappers rather than calling ulsdk directly, so that listings can be
+served from the metadata cache, writes invalidate it, transient failures are
+retried according to the policy in retry.py, and every request is counted in
+the run's stats and, with -trace, recorded in the trace.
+"""
+
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from ulsdk.api import drive
+from ulsdk.api.datacatalog import get_object
+from ulsdk.request_context import RequestContext
+from ulsdk.types.fs import DirectoryEntry, MoveRequest
+from requests import HTTPError
+from ulsdk.types.id import ObjectId
+
+from ulcli.commands.common import get_api_context, get_env_and_profile, uuid_from_id
+from ulcli.internal import transport
+from .cache import DEFAULT_TTL, DriveCache
+from .retry import DEFAULT_BUDGET, RetryBudget, call_with_retry, configure_budget
+from .stats import TransferStats, configure_stats, get_stats
+from .tracing import Tracer, configure_tracer, get_tracer
+
+T = TypeVar("T")
+
+_cache: Optional[DriveCache] = None
+
+# caches opened by this process, reused by later commands in the same process
+_caches: Dict[Tuple[str, float], DriveCache] = {}
+
+
+def configure_cache(cache: Optional[DriveCache]):
+    global _cache
+    _cache = cache
+
+
+def get_cache() -> Optional[DriveCache]:
+    return _cache
+
+
+def get_drive_context(parsed) -> RequestContext:
+    """
+    Build the request context for a drive command and set up the metadata
+    cache for the profile and environment it runs against.
+    """
+    # the drive SDK calls can only share connections through the patched
+    # module level requests helpers
+    transport.install()
+    context = get_api_context(parsed)
+    configure_budget(RetryBudget(getattr(parsed, "retry_budget", DEFAULT_BUDGET)))
+    configure_stats(TransferStats())
+    trace = getattr(parsed, "trace", None)
+    tracer = get_tracer()
+    # commands run by `ul shell -trace` share one trace
+    if tracer is None or tracer.path != trace:
+        configure_tracer(Tracer(trace) if trace else None)
+
+    if getattr(parsed, "no_cache", False):
+        configure_cache(None)
+    else:
+        env, profile = get_env_and_profile(parsed)
+        key = (f"{profile}:{env.name}", getattr(parsed, "cache_ttl", DEFAULT_TTL))
+        if key not in _caches:
+            _caches[key] = DriveCache(*key)
+        configure_cache(_caches[key])
+
+    return context
+
+
+def _describe(result: Any) -> Dict[str, Any]:
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        return {"received": len(result)}
+    slots = getattr(result, "slots", None)
+    if slots is not None:
+        return {"entries": len(slots)}
+    return {}
+
+
+def _status(error: Exception) -> str:
+    if isinstance(error, HTTPError) and error.response is not None:
+        # the sdk raises on some expected successes, like 204 from put_file_chunk
+        if error.response.status_code < 300:
+            return "ok"
+        return str(error.response.status_code)
+    return type(error).__name__
+
+
+def _call(name: str, fn: Callable[[], T], idempotent: bool, sent: int = 0) -> T:
+    """
+    Make a request through the retry policy, timing every attempt. sent is
+    the size of the request payload, for the trace.
+    """
+
+    def attempt() -> T:
+        args: Dict[str, Any] = {"sent": sent} if sent > 0 else {}
+        start = time.perf_counter()
+        try:
+            result = fn()
+            args.update(_describe(result))
+            args["status"] = "ok"
+            return result
+        except Exception as e:
+            args["status"] = _status(e)
+            raise e
+        finally:
+            end = time.perf_counter()
+            get_stats().request(name, end - start, args["status"] == "ok")
+            tracer = get_tracer()
+            if tracer is not None:
+                tracer.complete(name, "api", start, end, args)
+
+    return call_with_retry(name, attempt, idempotent)
+
+
+def ls(context: RequestContext, root: str, path: str):
+    if _cache is not None:
+        cached = _cache.get_listing(root, path)
+        if cached is not None:
+            return cached
+
+    result = _call("ls", lambda: drive.ls(context, root, path), idempotent=True)
+    if _cache is not None:
+        _cache.put_listing(root, path, result)
+    return result
+
+
+def get_roots(context: RequestContext):
+    if _cache is not None:
+        cached = _cache.get_listing("", "roots")
+        if cached is not None:
+            return cached
+
+    result = _call("get_roots", lambda: drive.get_roots(context), idempotent=True)
+    if _cache is not None:
+        _cache.put_listing("", "roots", result)
+    return result
+
+
+def get_root_id(context: RequestContext, id: str):
+    return _call("get_root_id", lambda: drive.get_root_id(context, id), idempotent=True)
+
+
+def get_parent(context: RequestContext, id: uuid.UUID) -> uuid.UUID:
+    if _cache is not None:
+        parent = _cache.get_parent(id)
+        if parent is not None:
+            return parent
+
+    obj_res = _call(
+        "get_object", lambda: get_object(context, ObjectId.from_uuid(id)), idempotent=True
+    )
+    obj_bytes = bytes(obj_res.obj)
+    entry = DirectoryEntry.from_bytes(obj_bytes)
+    parent = uuid_from_id(entry.parent)
+    assert parent is not None
+
+    if _cache is not None:
+        _cache.put_parent(id, parent)
+    return parent
+
+
+def get_file(context: RequestContext, id: ObjectId) -> bytes:
+    return _call("get_file", lambda: drive.get_file(context, id), idempotent=True)
+
+
+def create_entry(
+    context: RequestContext,
+    parent: ObjectId,
+    name: str,
+    ty: str,
+    mime: str,
+    num_chunks: int,
+):
+    try:
+        # a repeated create could make a second entry or fail as already existing
+        return _call(
+            "create_entry",
+            lambda: drive.create_entry(context, parent, name, ty, mime, num_chunks),
+            idempotent=False,
+        )
+    finally:
+        if _cache is not None:
+            _cache.invalidate([uuid_from_id(parent)])
+
+
+def put_file_chunk(context: RequestContext, id: ObjectId, index: int, hash: str, chunk: bytes):
+    # the server keys chunks by index, so resending one is harmless
+    return _call(
+        "put_file_chunk",
+        lambda: drive.put_file_chunk(context, id, index, hash, chunk),
+        idempotent=True,
+        sent=len(chunk),
+    )
+
+
+def move(
+    context: RequestContext,
+    id: ObjectId,
+    target: Optional[ObjectId],
+    overwrite: bool,
+    name: Optional[str] = None,
+):
+    """Move id into the target directory and/or rename it"""
+    try:
+        request = MoveRequest(name, target, id, overwrite)
+        return _call("move", lambda: drive.move(context, request), idempotent=False)
+    finally:
+        if _cache is not None:
+            oid = uuid_from_id(id)
+            _cache.invalidate([oid, uuid_from_id(target), _cached_parent(oid)])
+
+
+def unlink(context: RequestContext, id: ObjectId):
+    try:
+        return _call("unlink", lambda: drive.unlink(context, id), idempotent=True)
+    finally:
+        if _cache is not None:
+            oid = uuid_from_id(id)
+            _cache.invalidate([oid, _cached_parent(oid)])
+
+
+def _cached_parent(id: Optional[uuid.UUID]) -> Optional[uuid.UUID]:
+    if _cache is None or id is None:
+        return None
+    return _cache.get_parent(id)
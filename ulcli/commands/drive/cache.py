@@ -0,0 +1,352 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Persistent cache of drive metadata (directory listings, object parents and
+directory size subtotals), so that repeated commands against the same tree
+don't pay a round trip for data that hasn't changed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+from ulsdk.types.fs import ListDirectory, ListFile, ListObject, TopLevelDirectory
+from ulsdk.types.id import ObjectId
+
+from ulcli.commands.common import uuid_from_id
+from .hashcache import cache_dir
+
+# listings aren't reused unless a command is given -cache-ttl
+DEFAULT_TTL = 0.0
+
+# the kinds of listed entry, as stored in the cache
+SLOT_KINDS = {
+    "file": ListFile,
+    "directory": ListDirectory,
+    "object": ListObject,
+    "top": TopLevelDirectory,
+}
+_KIND_NAMES = {ty: name for name, ty in SLOT_KINDS.items()}
+
+
+class CachedEntry(NamedTuple):
+    value: Any
+
+
+class CachedSlot(NamedTuple):
+    """A listed entry read back from the cache, with the fields of a ListSlot"""
+
+    id: ObjectId
+    name: str
+    entry: CachedEntry
+    size: int
+    time: int
+    user_permissions: int
+
+
+class CachedListing(NamedTuple):
+    slots: List[CachedSlot]
+
+
+def _encode_slot(slot) -> Optional[Dict[str, Any]]:
+    kind = _KIND_NAMES.get(type(slot.entry.value))
+    id = uuid_from_id(slot.id)
+    if kind is None or id is None:
+        return None
+    return {
+        "id": str(id),
+        "name": slot.name,
+        "kind": kind,
+        "size": slot.size,
+        "time": slot.time,
+        "permissions": slot.user_permissions,
+    }
+
+
+def _decode_slot(fields: Dict[str, Any]) -> CachedSlot:
+    ty = SLOT_KINDS[fields["kind"]]
+    # the entry kind is only ever checked by type, so an instance is made
+    # without running the SDK's constructor
+    return CachedSlot(
+        ObjectId.from_uuid(uuid.UUID(fields["id"])),
+        fields["name"],
+        CachedEntry(ty.__new__(ty)),
+        fields["size"],
+        fields["time"],
+        fields["permissions"],
+    )
+
+
+def add_cache_arguments(parser):
+    """Add the drive metadata cache arguments to a drive command's parser"""
+    parser.add_argument(
+        "-no-cache",
+        action="store_true",
+        help="don't read or write the drive metadata cache in ~/.ul/cache",
+    )
+    parser.add_argument(
+        "-cache-ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="reuse drive listings fetched by earlier commands for up to this many seconds. Changes made outside ul may not be seen until they expire. Off by default",
+    )
+
+
+class DriveCache:
+    """
+    Entries are scoped to a namespace (the profile and environment the
+    commands run against). Listings and parent links are only reused for ttl
+    seconds, and not at all when ttl is 0. Writes made through ulcli
+    invalidate the affected entries immediately; changes made by anyone else
+    become visible once the cached entry expires.
+    """
+
+    def __init__(self, namespace: str, ttl: float = DEFAULT_TTL, path: Optional[str] = None):
+        if path is None:
+            os.makedirs(cache_dir(), exist_ok=True)
+            path = os.path.join(cache_dir(), "drive.sqlite")
+
+        self._namespace = namespace
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._db:
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(listings)")]
+            if "result" in columns:
+                # listings used to be stored as pickled SDK objects
+                self._db.execute("DROP TABLE listings")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS listings (
+                    ns TEXT,
+                    root TEXT,
+                    path TEXT,
+                    fetched REAL,
+                    nested INTEGER,
+                    slots TEXT,
+                    PRIMARY KEY (ns, root, path)
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS listings_nested ON listings (ns, nested)")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS listing_children (
+                    ns TEXT,
+                    root TEXT,
+                    path TEXT,
+                    child TEXT
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS listing_children_child ON listing_children (ns, child)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS listing_children_listing ON listing_children (ns, root, path)"
+            )
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS parents (
+                    ns TEXT,
+                    id TEXT,
+                    parent TEXT,
+                    fetched REAL,
+                    PRIMARY KEY (ns, id)
+                )"""
+            )
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS subtotals (
+                    ns TEXT,
+                    id TEXT,
+                    time INTEGER,
+                    files INTEGER,
+                    dirs INTEGER,
+                    bytes INTEGER,
+                    parent TEXT,
+                    PRIMARY KEY (ns, id)
+                )"""
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(subtotals)")]
+            if "parent" not in columns:
+                # caches written before subtotals recorded their parent
+                self._db.execute("ALTER TABLE subtotals ADD COLUMN parent TEXT")
+
+    def _fresh_after(self) -> float:
+        return time.time() - self._ttl
+
+    def get_listing(self, root: str, path: str) -> Optional[CachedListing]:
+        if self._ttl <= 0:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT slots FROM listings WHERE ns = ? AND root = ? AND path = ? AND fetched >= ?",
+                (self._namespace, root, path, self._fresh_after()),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        try:
+            return CachedListing([_decode_slot(fields) for fields in json.loads(row[0])])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Dropping unreadable cached listing of {root}/{path}: {e}")
+            return None
+
+    def put_listing(self, root: str, path: str, result: Any):
+        if self._ttl <= 0:
+            return
+
+        slots = [_encode_slot(slot) for slot in result.slots]
+        if any(fields is None for fields in slots):
+            logger.debug(f"Not caching listing of {root}/{path}: it has entries of an unknown kind")
+            return
+
+        with self._lock, self._db:
+            self._drop_listing(root, path)
+            self._db.execute(
+                "INSERT INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+                (self._namespace, root, path, time.time(), int("/" in path), json.dumps(slots)),
+            )
+            self._db.executemany(
+                "INSERT INTO listing_children VALUES (?, ?, ?, ?)",
+                [(self._namespace, root, path, fields["id"]) for fields in slots if fields is not None],
+            )
+
+    def _drop_listing(self, root: str, path: str):
+        self._db.execute(
+            "DELETE FROM listings WHERE ns = ? AND root = ? AND path = ?",
+            (self._namespace, root, path),
+        )
+        self._db.execute(
+            "DELETE FROM listing_children WHERE ns = ? AND root = ? AND path = ?",
+            (self._namespace, root, path),
+        )
+
+    def get_parent(self, id: uuid.UUID) -> Optional[uuid.UUID]:
+        if self._ttl <= 0:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT parent FROM parents WHERE ns = ? AND id = ? AND fetched >= ?",
+                (self._namespace, str(id), self._fresh_after()),
+            ).fetchone()
+
+        return uuid.UUID(row[0]) if row is not None else None
+
+    def put_parent(self, id: uuid.UUID, parent: uuid.UUID):
+        if self._ttl <= 0:
+            return
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO parents VALUES (?, ?, ?, ?)",
+                (self._namespace, str(id), str(parent), time.time()),
+            )
+
+    def get_subtotal(self, id: uuid.UUID, time: int) -> Optional[Tuple[int, int, int]]:
+        """
+        The (files, dirs, bytes) below directory id, if they were measured
+        when its last modified time was time. Subtotals don't expire.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT files, dirs, bytes FROM subtotals WHERE ns = ? AND id = ? AND time = ?",
+                (self._namespace, str(id), time),
+            ).fetchone()
+
+        return (row[0], row[1], row[2]) if row is not None else None
+
+    def put_subtotal(
+        self,
+        id: uuid.UUID,
+        time: int,
+        files: int,
+        dirs: int,
+        bytes: int,
+        parent: Optional[uuid.UUID] = None,
+    ):
+        """
+        Store the totals below directory id. parent, if known, is kept with
+        them so that a change below an ancestor invalidates its subtotal;
+        storing without one keeps the parent recorded before.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT INTO subtotals VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ns, id) DO UPDATE SET
+                    time = excluded.time,
+                    files = excluded.files,
+                    dirs = excluded.dirs,
+                    bytes = excluded.bytes,
+                    parent = COALESCE(excluded.parent, subtotals.parent)""",
+                (self._namespace, str(id), time, files, dirs, bytes, str(parent) if parent else None),
+            )
+
+    def invalidate(self, ids: Iterable[Optional[uuid.UUID]]):
+        """
+        Drop everything that may have changed when the given objects (or the
+        directories containing them) were modified: listings rooted at or
+        containing any of them, their parent links, listings of nested paths,
+        which can't be attributed to a single directory, and the subtotals of
+        them and of every directory above them that a subtotal or a cached
+        parent link leads to.
+        """
+        keys = [str(id) for id in ids if id is not None]
+        if len(keys) == 0:
+            return
+
+        with self._lock, self._db:
+            # the subtotals of every ancestor include the change; links are
+            # followed however old they are, since directories rarely move
+            ancestors: Set[str] = set()
+            pending = list(keys)
+            while len(pending) > 0:
+                current = pending.pop()
+                rows = self._db.execute(
+                    """SELECT parent FROM subtotals WHERE ns = ? AND id = ? AND parent IS NOT NULL
+                    UNION SELECT parent FROM parents WHERE ns = ? AND id = ?""",
+                    (self._namespace, current, self._namespace, current),
+                ).fetchall()
+                for (parent,) in rows:
+                    if parent not in ancestors:
+                        ancestors.add(parent)
+                        pending.append(parent)
+            for ancestor in ancestors:
+                self._db.execute(
+                    "DELETE FROM subtotals WHERE ns = ? AND id = ?",
+                    (self._namespace, ancestor),
+                )
+
+            stale = self._db.execute(
+                "SELECT root, path FROM listings WHERE ns = ? AND nested = 1",
+                (self._namespace,),
+            ).fetchall()
+            for key in keys:
+                stale += self._db.execute(
+                    "SELECT root, path FROM listings WHERE ns = ? AND root = ?",
+                    (self._namespace, key),
+                ).fetchall()
+                stale += self._db.execute(
+                    "SELECT root, path FROM listing_children WHERE ns = ? AND child = ?",
+                    (self._namespace, key),
+                ).fetchall()
+                self._db.execute(
+                    "DELETE FROM parents WHERE ns = ? AND id = ?",
+                    (self._namespace, key),
+                )
+                self._db.execute(
+                    "DELETE FROM subtotals WHERE ns = ? AND id = ?",
+                    (self._namespace, key),
+                )
+            for root, path in set(stale):
+                self._drop_listing(root, path)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM listings WHERE ns = ?", (self._namespace,))
+            self._db.execute("DELETE FROM listing_children WHERE ns = ?", (self._namespace,))
+            self._db.execute("DELETE FROM parents WHERE ns = ?", (self._namespace,))
+            self._db.execute("DELETE FROM subtotals WHERE ns = ?", (self._namespace,))
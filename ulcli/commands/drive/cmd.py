@@ -5,14 +5,6 @@ from ulcli.internal import Console
 from ulcli.commands.command import UlcliCommand
 import ulcli.cmdparser
 
-from .rename import drive_rename
-from .move import drive_move
-from .ls import drive_ls
-from .cp import drive_cp
-from .mkdir import drive_mkdir
-from .rm import drive_rm
-from .root import drive_root
-
 
 class Drive(UlcliCommand):
     __help__ = "Drive commands"
@@ -21,14 +13,35 @@ class Drive(UlcliCommand):
         super().__init__("drive")
 
     def run(self):
+        # subcommand modules are only imported when they are dispatched to
         parser = ulcli.cmdparser.CmdParser("drive")
-        parser.add_cmd("ls", "list files", drive_ls)
-        parser.add_cmd("cp", "copy files", drive_cp)
-        parser.add_cmd("mkdir", "make directories", drive_mkdir)
-        parser.add_cmd("rm", "unlink files/directories", drive_rm)
-        parser.add_cmd("mv", "move files/directories", drive_move)
-        parser.add_cmd("rename", "rename files/directories", drive_rename)
-        parser.add_cmd("root", "get the id of the drive root id of a group", drive_root)
+        parser.add_cmd("ls", "list files", "ulcli.commands.drive.ls:drive_ls")
+        parser.add_cmd("cp", "copy files", "ulcli.commands.drive.cp:drive_cp")
+        parser.add_cmd(
+            "find", "recursively search directories", "ulcli.commands.drive.find:drive_find"
+        )
+        parser.add_cmd(
+            "sync",
+            "copy new and changed files between directories",
+            "ulcli.commands.drive.sync:drive_sync",
+        )
+        parser.add_cmd(
+            "inventory",
+            "write a snapshot of the metadata of a directory tree",
+            "ulcli.commands.drive.inventory:drive_inventory",
+        )
+        parser.add_cmd("du", "summarize disk usage of directories", "ulcli.commands.drive.du:drive_du")
+        parser.add_cmd("mkdir", "make directories", "ulcli.commands.drive.mkdir:drive_mkdir")
+        parser.add_cmd("rm", "unlink files/directories", "ulcli.commands.drive.rm:drive_rm")
+        parser.add_cmd("mv", "move files/directories", "ulcli.commands.drive.move:drive_move")
+        parser.add_cmd(
+            "rename", "rename files/directories", "ulcli.commands.drive.rename:drive_rename"
+        )
+        parser.add_cmd(
+            "root",
+            "get the id of the drive root id of a group",
+            "ulcli.commands.drive.root:drive_root",
+        )
 
         try:
             return parser.dispatch(sys.argv[2:])
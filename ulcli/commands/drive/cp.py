@@ -2,40 +2,68 @@
 
 import argparse
 import glob
+import io
+import os
 import os.path
 import urllib.parse
 import uuid
 import hashlib
 import math
+import shutil
+import threading
 import time
 import magic
 from abc import ABC, abstractmethod
-from typing import List, Self
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator, List, Optional, Self
 from requests import HTTPError
 from flatbuffers import util
 from loguru import logger
 
 import ulcli.argparser
-from ulcli.commands.common import get_api_context
 from ulcli.commands.common import uuid_from_id
-from ulsdk.api.datacatalog import get_object
 from ulsdk.types.id import ObjectId
-from ulsdk.types.fs import ListSlot, DirectoryEntry, ListDirectory, TopLevelDirectory
+from ulsdk.types.fs import ListSlot, ListDirectory, TopLevelDirectory
 from ulsdk.request_context import RequestContext
-from ulsdk.api.drive import (
+
+from .api import (
+    get_drive_context,
     get_file,
+    get_parent,
     ls,
     get_roots,
     create_entry,
-    post_file,
     put_file_chunk,
     unlink,
+    move,
+)
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+
+from .utils import format_size, parse_timestamp_arg, timestamp_in_range, is_directory_entry_id
+from .transfer import (
+    ByteBudget,
+    TransferOptions,
+    choose_chunk_size,
+    inflight_limit,
+    max_chunk_size,
+    throughput,
 )
+from .scheduler import TransferScheduler
+from .journal import UploadJournal, journaled_chunk_size, prune_journals
+from .hashcache import FileDigests, HashCache, file_digest
+from .stats import add_stats_arguments, get_stats, reporting
+from .tracing import add_trace_arguments, span
 
-from .utils import parse_timestamp_arg, timestamp_in_range, is_directory_entry_id
+# libmagic only needs the first few KB of a file to identify it
+MIME_SNIFF_SIZE = 64 * 1024
 
+# size of the pieces written to local files, so data reaches disk as it arrives
+LOCAL_WRITE_SIZE = 1024 * 1024
 
-CHUNK_SIZE = 96 * 1024 * 1024
+# statuses of a chunk upload into an entry that was deleted or has expired
+GONE_STATUSES = {404, 410}
 
 
 class Entry(ABC):
@@ -43,6 +71,14 @@ class Entry(ABC):
     def get(self) -> bytes:
         """Get the file content"""
 
+    @abstractmethod
+    def open(self) -> BinaryIO:
+        """Open the file content as a binary stream"""
+
+    @abstractmethod
+    def size(self) -> int:
+        """Return the size of the entry in bytes"""
+
     @abstractmethod
     def name(self) -> str:
         """Return the entry's name"""
@@ -56,8 +92,8 @@ class Entry(ABC):
         """Return whether or not an entry is a directory"""
 
     @abstractmethod
-    def put(self, content: bytes, filename: str):
-        """Append a new file to the directory"""
+    def put(self, src: "Entry", filename: str, options: TransferOptions = TransferOptions()):
+        """Copy the content of src to a new file in the directory"""
 
     @abstractmethod
     def collect(self) -> List[Self]:
@@ -68,35 +104,283 @@ class Entry(ABC):
         """Make a directory in the current directory"""
 
 
-def put_chunk(context: RequestContext, id: uuid.UUID, chunk: bytes):
-    for i in range(10):
-        h = hashlib.sha256()
-        h.update(chunk)
-        hash = h.hexdigest()
-        try:
-            put_file_chunk(context, ObjectId.from_uuid(id), i, hash, chunk)
-        except HTTPError as e:
-            if e.response.status_code == 514:
-                time.sleep(1)
-                continue
+def chunk_hash(chunk: bytes | memoryview) -> str:
+    h = hashlib.sha256()
+    h.update(chunk)
+    return h.hexdigest()
 
-            if e.response.status_code == 204:
-                return
 
+def put_chunk(
+    context: RequestContext,
+    id: uuid.UUID,
+    index: int,
+    chunk: bytes,
+    hash: Optional[str] = None,
+):
+    if hash is None:
+        hash = chunk_hash(chunk)
+    # retries on busy (514) and other transient errors are made by the api layer
+    try:
+        put_file_chunk(context, ObjectId.from_uuid(id), index, hash, chunk)
+    except HTTPError as e:
+        if e.response.status_code != 204:
             raise e
 
 
-def put_file(context: RequestContext, parent: uuid.UUID, content: bytes, filename: str):
-    content_len = len(content)
-    num_chunks = math.ceil(content_len / CHUNK_SIZE)
-    mime = magic.from_buffer(content, mime=True)
-    summary = create_entry(context, ObjectId.from_uuid(parent), filename, "file", mime, num_chunks)
-    id = uuid_from_id(summary.id)
-    assert id
+def stream_size(f: BinaryIO) -> int:
+    pos = f.tell()
+    size = f.seek(0, io.SEEK_END)
+    f.seek(pos)
+    return size
+
+
+def sniff_mime(f: BinaryIO) -> str:
+    pos = f.tell()
+    header = f.read(MIME_SNIFF_SIZE)
+    f.seek(pos)
+    return magic.from_buffer(header, mime=True)
+
+
+def put_file(
+    context: RequestContext,
+    parent: uuid.UUID,
+    f: BinaryIO,
+    filename: str,
+    options: TransferOptions = TransferOptions(),
+    journal: Optional[UploadJournal] = None,
+    chunk_hashes: Optional[List[Optional[str]]] = None,
+    chunk_size: Optional[int] = None,
+) -> uuid.UUID:
+    """
+    Upload the content of the (seekable) stream f to a new file in parent.
+    Chunks are read from the stream as they are needed, so memory use is
+    bounded by the in-flight budget rather than the file size. If a journal
+    is given, acknowledged chunks are recorded in it and chunks it already
+    holds are not sent again. chunk_hashes, if given, holds one digest (or
+    None) per chunk, from a hash cache entry that still matches the file;
+    chunks with a digest aren't hashed again, and the digests of the others
+    are filled in as they are read. The chunk size is chosen by
+    choose_chunk_size unless given, and every chunk read is counted against
+    the memory budget in options. If the entry a journal resumes into turns
+    out to be gone, the journal is dropped and the upload starts over.
+    """
+    content_len = stream_size(f)
+    # chunks are sent on other threads, so note which transfer they belong to
+    transfer = get_stats().current()
+    if chunk_size is None:
+        chunk_size = choose_chunk_size(content_len, options)
+    num_chunks = math.ceil(content_len / chunk_size)
+    start_pos = f.tell()
+
+    def create() -> uuid.UUID:
+        mime = sniff_mime(f)
+        summary = create_entry(context, ObjectId.from_uuid(parent), filename, "file", mime, num_chunks)
+        created = uuid_from_id(summary.id)
+        assert created
+        if journal is not None:
+            journal.begin(created)
+        return created
+
+    id = journal.entry_id() if journal is not None else None
+    resumed = id is not None
+    if resumed:
+        logger.info(f"Resuming upload of {filename} into existing entry {id}")
+    else:
+        id = create()
 
-    for i in range(num_chunks):
-        chunk = content[i * CHUNK_SIZE : (i + 1) * CHUNK_SIZE]
-        put_chunk(context, id, chunk)
+    def hash_of(index: int, chunk: bytes) -> str:
+        if chunk_hashes is None:
+            return chunk_hash(chunk)
+        known = chunk_hashes[index]
+        if known is None:
+            known = chunk_hashes[index] = chunk_hash(chunk)
+        return known
+
+    def send(index: int, chunk: bytes, hash: str):
+        if journal is not None and journal.is_committed(index, hash):
+            return
+
+        start = time.perf_counter()
+        put_chunk(context, id, index, chunk, hash)
+        throughput.record(len(chunk), time.perf_counter() - start)
+        get_stats().transferred(len(chunk), transfer)
+
+        if journal is not None:
+            journal.ack(index, hash)
+
+    memory = options.memory
+
+    def reserve(index: int) -> int:
+        if memory is None:
+            return 0
+        return memory.acquire(min(chunk_size, content_len - index * chunk_size))
+
+    def free(n: int):
+        if memory is not None:
+            memory.release(n)
+
+    try:
+        _send_chunks(f, content_len, chunk_size, options, hash_of, send, reserve, free)
+    except HTTPError as e:
+        if not resumed or e.response is None or e.response.status_code not in GONE_STATUSES:
+            raise e
+        assert journal is not None
+        logger.warning(f"Entry {id} of the interrupted upload of {filename} is gone; starting over")
+        journal.finish()
+        f.seek(start_pos)
+        id = create()
+        _send_chunks(f, content_len, chunk_size, options, hash_of, send, reserve, free)
+
+    if journal is not None:
+        journal.finish()
+
+    return id
+
+
+# chunks are sent from threads that outlive any one file, so that each keeps
+# its HTTP session, and the connections in it, from one file to the next
+_senders: Optional[ThreadPoolExecutor] = None
+_senders_size = 0
+_senders_lock = threading.Lock()
+
+
+def chunk_senders(workers: int) -> ThreadPoolExecutor:
+    """The shared pool chunks are sent on, grown to at least workers threads"""
+    global _senders, _senders_size
+    with _senders_lock:
+        if _senders is None or _senders_size < workers:
+            # a replaced pool's threads exit once the files using it are done
+            _senders = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk-sender")
+            _senders_size = workers
+        return _senders
+
+
+def _send_chunks(
+    f: BinaryIO,
+    content_len: int,
+    chunk_size: int,
+    options: TransferOptions,
+    hash_of: Callable[[int, bytes], str],
+    send: Callable[[int, bytes, str], None],
+    reserve: Callable[[int], int],
+    free: Callable[[int], None],
+):
+    """Read every chunk of f and send it, as configured in options"""
+    num_chunks = math.ceil(content_len / chunk_size)
+
+    def upload(index: int, chunk: bytes):
+        send(index, chunk, hash_of(index, chunk))
+
+    if num_chunks <= 1:
+        for i in range(num_chunks):
+            reserved = reserve(i)
+            try:
+                upload(i, f.read(chunk_size))
+            finally:
+                free(reserved)
+    elif options.chunk_parallelism <= 1:
+        # chunks are sent one at a time, but the next chunk is read and hashed
+        # on this thread while the previous one is on the wire (hashlib drops
+        # the GIL for large buffers)
+        sender = chunk_senders(options.jobs)
+        sending: Optional[Future] = None
+        for i in range(num_chunks):
+            reserved = reserve(i)
+            try:
+                chunk = f.read(chunk_size)
+                hash = hash_of(i, chunk)
+                if sending is not None:
+                    sending.result()
+            except BaseException:
+                free(reserved)
+                raise
+
+            sending = sender.submit(send, i, chunk, hash)
+            sending.add_done_callback(lambda _, n=reserved: free(n))
+            del chunk
+
+        assert sending is not None
+        sending.result()
+    else:
+        pool = chunk_senders(options.jobs * options.chunk_parallelism)
+        # the pool is shared with the other files, so this file's share of it
+        # is bounded here
+        slots = threading.BoundedSemaphore(options.chunk_parallelism)
+        budget = ByteBudget(inflight_limit(chunk_size, options))
+        futures: List[Future] = []
+        for i in range(num_chunks):
+            slots.acquire()
+            reserved = budget.acquire(min(chunk_size, content_len - i * chunk_size))
+            shared = reserve(i)
+
+            def release(_, reserved=reserved, shared=shared):
+                budget.release(reserved)
+                free(shared)
+                slots.release()
+
+            # stop reading as soon as any chunk has failed
+            failed = next((fut for fut in futures if fut.done() and fut.exception()), None)
+            if failed is not None:
+                release(None)
+                break
+
+            chunk = f.read(chunk_size)
+            future = pool.submit(upload, i, chunk)
+            future.add_done_callback(release)
+            futures.append(future)
+            del chunk
+
+        for future in futures:
+            future.result()
+
+
+def write_file_atomic(dest_name: str, f: BinaryIO):
+    """
+    Write the stream f to dest_name through a temporary file in the same
+    directory, renaming it into place once complete so that readers never see
+    a partially written file.
+    """
+    dirname, basename = os.path.split(dest_name)
+    tmp_name = os.path.join(dirname, f".{basename}.{uuid.uuid4().hex[:8]}.part")
+    fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            shutil.copyfileobj(f, fout, LOCAL_WRITE_SIZE)
+        os.replace(tmp_name, dest_name)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def holding_source(
+    src: Entry, filename: str, in_flight: int, options: TransferOptions
+) -> Iterator[TransferOptions]:
+    """
+    Drive files are downloaded whole before they are written anywhere, so for
+    a drive src, reserve its size plus in_flight bytes of chunks copied out of
+    it against the memory budget for as long as the copy runs. Yields the
+    options to copy with, which leave nothing more to reserve. Raises
+    ValueError if the copy can't fit in the budget at all.
+    """
+    memory = options.memory
+    if memory is None or not isinstance(src, DriveEntry):
+        yield options
+        return
+
+    needed = src.size() + in_flight
+    if needed > memory.limit():
+        raise ValueError(
+            f"Copying {filename} holds {format_size(needed)} in memory, more than -max-memory allows"
+        )
+    reserved = memory.acquire(needed)
+    try:
+        yield options._replace(memory=None)
+    finally:
+        memory.release(reserved)
 
 
 def mk_dir(context: RequestContext, parent: uuid.UUID, dir: str) -> ObjectId:
@@ -107,7 +391,7 @@ def mk_dir(context: RequestContext, parent: uuid.UUID, dir: str) -> ObjectId:
 class Removable(ABC):
     @abstractmethod
     def rm(self):
-        """Remove the entry from the drive"""
+        """Remove the entry"""
 
 
 class DriveEntry(Entry, Removable):
@@ -120,17 +404,26 @@ class DriveEntry(Entry, Removable):
         assert oid is not None
         self._oid = oid
 
+    def id(self) -> uuid.UUID:
+        return self._oid
+
+    def slot(self) -> ListSlot:
+        return self._slot
+
     def parent(self) -> uuid.UUID:
-        obj_res = get_object(self._context, ObjectId.from_uuid(self._oid))
-        obj_bytes = bytes(obj_res.obj)
-        entry = DirectoryEntry.from_bytes(obj_bytes)
-        id = uuid_from_id(entry.parent)
-        assert id is not None
-        return id
+        return get_parent(self._context, self._oid)
 
     def get(self):
         return get_file(self._context, ObjectId.from_uuid(self._oid))
 
+    def open(self) -> BinaryIO:
+        # the SDK hands back the whole payload; BytesIO shares its buffer
+        # rather than copying it, and drops it when the stream is closed
+        return io.BytesIO(self.get())
+
+    def size(self) -> int:
+        return self._slot.size
+
     def name(self):
         return self._slot.name
 
@@ -142,12 +435,117 @@ class DriveEntry(Entry, Removable):
             self._slot.entry.value, TopLevelDirectory
         )
 
-    def put(self, content: bytes, filename: str):
-        if self.isdir():
-            put_file(self._context, self._oid, content, filename)
-        else:
-            parent_id = self.parent()
-            put_file(self._context, parent_id, content, filename)
+    def put(self, src: Entry, filename: str, options: TransferOptions = TransferOptions()):
+        parent_id = self._oid if self.isdir() else self.parent()
+        local_path = src.path() if isinstance(src, LocalEntry) else None
+        hash_cache = options.hash_cache if local_path is not None else None
+
+        if hash_cache is not None and options.skip_identical:
+            assert local_path is not None
+            if self._has_identical(parent_id, filename, local_path, src.size(), hash_cache):
+                logger.info(f"Skipping {filename}; the destination already has identical content")
+                get_stats().skip()
+                return
+
+        chunk_size = options.chunk_size
+        if chunk_size is None and local_path is not None:
+            # finish an interrupted upload with the chunk size it started with,
+            # or reuse the one the file was last hashed with, rather than a
+            # size that depends on what was uploaded before it
+            if options.resume:
+                chunk_size = journaled_chunk_size(local_path, parent_id, filename)
+            if chunk_size is None and hash_cache is not None:
+                chunk_size = hash_cache.chunk_size(local_path)
+            limit = max_chunk_size(options)
+            if chunk_size is not None and limit is not None and chunk_size > limit:
+                chunk_size = None
+        if chunk_size is None:
+            chunk_size = choose_chunk_size(src.size(), options)
+
+        # only uploads spanning several chunks are worth resuming
+        journal = None
+        if options.resume and local_path is not None and src.size() > chunk_size:
+            journal = UploadJournal(local_path, parent_id, filename, chunk_size)
+
+        before = os.stat(local_path) if local_path is not None else None
+        chunk_hashes: Optional[List[Optional[str]]] = None
+        if hash_cache is not None:
+            assert local_path is not None
+            # cached digests are only returned while the file's inode, size
+            # and mtime match, and are then sent without hashing again
+            digests = hash_cache.lookup(local_path, chunk_size)
+            if digests is not None:
+                chunk_hashes = list(digests.chunks)
+            else:
+                chunk_hashes = [None] * math.ceil(src.size() / chunk_size)
+
+        in_flight = min(src.size(), inflight_limit(chunk_size, options))
+        with holding_source(src, filename, in_flight, options) as upload_options, src.open() as f:
+            id = put_file(
+                self._context, parent_id, f, filename, upload_options, journal, chunk_hashes, chunk_size
+            )
+
+        if hash_cache is not None and chunk_hashes is not None:
+            assert local_path is not None and before is not None
+            after = os.stat(local_path)
+            hashes = [hash for hash in chunk_hashes if hash is not None]
+            # the digests describe what was read, which is only the file's
+            # content if it didn't change while it was uploaded
+            unchanged = (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns)
+            if unchanged and len(hashes) == len(chunk_hashes):
+                digests = FileDigests(chunk_size, hashes, file_digest(chunk_size, hashes))
+                hash_cache.store(local_path, digests)
+                hash_cache.record_upload(parent_id, filename, id, digests)
+
+    def _has_identical(
+        self,
+        parent_id: uuid.UUID,
+        filename: str,
+        local_path: str,
+        size: int,
+        hash_cache: HashCache,
+    ) -> bool:
+        uploaded = hash_cache.uploaded(parent_id, filename)
+        if uploaded is None:
+            return False
+
+        # the entry we uploaded must still be there under the same name
+        entry_id, chunk_size, digest = uploaded
+        slots = ls(self._context, str(parent_id), filename).slots
+        if not any(uuid_from_id(slot.id) == entry_id and slot.size == size for slot in slots):
+            return False
+
+        # compare digests made with the chunk size that upload used
+        return hash_cache.digests(local_path, chunk_size).digest == digest
+
+    def replace(self, src: Entry, filename: str, options: TransferOptions = TransferOptions()):
+        """
+        Upload src under a temporary name, then rename it over filename. The
+        temporary entry is removed if either step fails.
+        """
+        parent_id = self._oid if self.isdir() else self.parent()
+        tmp_name = f".{filename}.{uuid.uuid4().hex[:8]}.part"
+        chunk_size = choose_chunk_size(src.size(), options)
+        in_flight = min(src.size(), inflight_limit(chunk_size, options))
+        try:
+            with holding_source(src, filename, in_flight, options) as upload_options, src.open() as f:
+                id = put_file(
+                    self._context, parent_id, f, tmp_name, upload_options, chunk_size=chunk_size
+                )
+            move(self._context, ObjectId.from_uuid(id), None, True, filename)
+        except BaseException:
+            self._remove_partial(parent_id, tmp_name)
+            raise
+
+    def _remove_partial(self, parent_id: uuid.UUID, name: str):
+        # put_file doesn't hand back the entry it created when it fails, so
+        # look the (uniquely named) temporary entry up
+        try:
+            for slot in ls(self._context, str(parent_id), name).slots:
+                if slot.name == name:
+                    unlink(self._context, slot.id)
+        except Exception as e:
+            logger.warning(f"Couldn't remove the partial upload {name}: {e}")
 
     def collect(self) -> List["DriveEntry"]:
         assert self.isdir()
@@ -166,8 +564,13 @@ class DriveEntry(Entry, Removable):
             else:
                 raise e
 
-        entries = self.collect()
-        for entry in entries:
+        # look the new directory up by name rather than re-listing the parent
+        res = ls(self._context, str(self._oid), dir)
+        for slot in res.slots:
+            if slot.name == dir:
+                return DriveEntry(self._context, slot)
+
+        for entry in self.collect():
             if entry.name() == dir:
                 return entry
 
@@ -177,7 +580,7 @@ class DriveEntry(Entry, Removable):
         unlink(self._context, ObjectId.from_uuid(self._oid))
 
 
-class LocalEntry(Entry):
+class LocalEntry(Entry, Removable):
     def __init__(self, path: str):
         self._path = os.path.realpath(path)
 
@@ -185,6 +588,15 @@ class LocalEntry(Entry):
         with open(self._path, "rb") as f:
             return f.read()
 
+    def path(self) -> str:
+        return self._path
+
+    def open(self) -> BinaryIO:
+        return open(self._path, "rb")
+
+    def size(self) -> int:
+        return os.path.getsize(self._path)
+
     def name(self):
         parent, name = os.path.split(self._path)
         return name
@@ -195,10 +607,12 @@ class LocalEntry(Entry):
     def isdir(self):
         return os.path.isdir(self._path)
 
-    def put(self, content: bytes, filename: str):
+    def put(self, src: Entry, filename: str, options: TransferOptions = TransferOptions()):
         dest_name = os.path.join(self._path, filename) if self.isdir() else self._path
-        with open(dest_name, "wb") as f:
-            f.write(content)
+
+        with holding_source(src, filename, 0, options), src.open() as f:
+            write_file_atomic(dest_name, f)
+        get_stats().transferred(src.size())
 
     def collect(self) -> List["LocalEntry"]:
         return [LocalEntry(x) for x in glob.glob(os.path.join(self._path, "*"))]
@@ -208,6 +622,12 @@ class LocalEntry(Entry):
         os.mkdir(path)
         return LocalEntry(path)
 
+    def rm(self):
+        if self.isdir():
+            shutil.rmtree(self._path)
+        else:
+            os.remove(self._path)
+
 
 def is_directory_entry_id(id: str) -> bool:
     try:
@@ -218,18 +638,15 @@ def is_directory_entry_id(id: str) -> bool:
 
 
 def get_dir_list_slot(context: RequestContext, id: str) -> DriveEntry:
-    obj_res = get_object(context, ObjectId.from_uuid(id))
-    obj_bytes = bytes(obj_res.obj)
-    entry = DirectoryEntry.from_bytes(obj_bytes)
-    parent = uuid_from_id(entry.parent)
+    parent = get_parent(context, uuid.UUID(id))
 
-    if parent == "00000000-0000-0000-0000-000000000000":
+    if parent == uuid.UUID(int=0):
         children = get_roots(context)
     else:
         children = ls(context, str(parent), "*")
 
     for child in children.slots:
-        if uuid_from_id(child.id) == id:
+        if uuid_from_id(child.id) == uuid.UUID(id):
             return DriveEntry(context, child)
     raise ValueError(f"Could not find directory with id {id} in parent {parent}")
 
@@ -283,21 +700,51 @@ def parse_files(context: RequestContext, files: List[str]) -> List[Entry]:
     return resolved_files
 
 
-def do_cp_r(context: RequestContext, source: Entry, dest: Entry) -> bool:
-    src_entries = source.collect()
-    for src in src_entries:
-        if src.isdir():
-            dest_child = dest.mkdir(src.name())
-            do_cp_r(context, src, dest_child)
-        else:
-            logger.info(f"Processing {src.name()}")
-
-            content = src.get()
-            dest.put(content, src.name())
+def copy_file(src: Entry, dest: Entry, options: TransferOptions):
+    logger.info(f"Processing {src.name()}")
+    with get_stats().file(src.name(), src.size()), span(
+        f"copy {src.name()}", "file", {"size": src.size()}
+    ):
+        dest.put(src, src.name(), options)
+
+
+def do_cp_r(
+    context: RequestContext,
+    source: Entry,
+    dest: Entry,
+    options: TransferOptions = TransferOptions(),
+) -> bool:
+    # Directories are walked (and created at the destination) on this thread
+    # while the files found so far are copied by the scheduler's workers.
+    with TransferScheduler(options.jobs) as scheduler:
+        pending = [(source, dest)]
+        while len(pending) > 0 and not scheduler.failed():
+            src_dir, dest_dir = pending.pop()
+            for src in src_dir.collect():
+                if src.isdir():
+                    pending.append((src, dest_dir.mkdir(src.name())))
+                else:
+                    get_stats().expect(src.size())
+                    scheduler.submit(
+                        src.size(),
+                        lambda src=src, dest=dest_dir: copy_file(src, dest, options),
+                    )
 
     return True
 
 
+def check_memory_arguments(parsed):
+    """Validate the -chunk-size and -max-memory arguments of cp and sync"""
+    if parsed.chunk_size is not None and parsed.chunk_size < 1:
+        raise Exception("-chunk-size must be at least 1")
+
+    if parsed.max_memory is not None and parsed.max_memory < 1:
+        raise Exception("-max-memory must be at least 1")
+
+    if parsed.chunk_size is not None and parsed.max_memory is not None and parsed.chunk_size > parsed.max_memory:
+        raise Exception("-chunk-size can't be larger than -max-memory")
+
+
 def drive_cp(args: List[str]) -> bool:
     description = "Copy files to and from the drive."
 
@@ -335,13 +782,57 @@ to be a directory.
         type=str,
         default=None,
     )
+    parser.add_argument(
+        "-j",
+        help="number of files to copy concurrently. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-chunk-parallelism",
+        help="number of chunks of a single file to upload concurrently. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-max-inflight",
+        help="maximum megabytes of chunk data in flight per file upload. Defaults to one chunk per parallel upload",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-chunk-size",
+        help="megabytes per upload chunk. By default chunks are sized from the file size, measured upload rate and -max-memory",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-max-memory",
+        help="maximum megabytes of file data held in memory across all concurrent transfers. Unlimited by default",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-skip-identical",
+        help="skip files whose content matches what this machine last uploaded to the same destination",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-no-resume",
+        help="don't resume interrupted uploads from, or record progress in, the upload journal in ~/.ul/journal",
+        action="store_true",
+    )
+    add_stats_arguments(parser)
     parser.add_argument(
         "files", nargs="+", help="cp pattern. please quote all wildcards"
     )
 
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
 
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
     files = parsed.files
     if len(files) < 2:
         raise Exception("Need at least two files (source and destination)")
@@ -356,6 +847,29 @@ to be a directory.
     if earliest is not None and latest is not None and earliest > latest:
         raise Exception("Earliest timestamp must be less than latest timestamp")
 
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
+    if parsed.chunk_parallelism < 1:
+        raise Exception("-chunk-parallelism must be at least 1")
+
+    check_memory_arguments(parsed)
+
+    options = TransferOptions(
+        jobs=parsed.j,
+        chunk_parallelism=parsed.chunk_parallelism,
+        max_inflight=parsed.max_inflight * 1024 * 1024 if parsed.max_inflight else None,
+        resume=not parsed.no_resume,
+        # digests are only kept for local files, so downloads and drive to
+        # drive copies don't need the cache
+        hash_cache=HashCache() if any(isinstance(src, LocalEntry) for src in sources) else None,
+        skip_identical=parsed.skip_identical,
+        chunk_size=parsed.chunk_size * 1024 * 1024 if parsed.chunk_size else None,
+        memory=ByteBudget(parsed.max_memory * 1024 * 1024) if parsed.max_memory else None,
+    )
+    if options.resume:
+        prune_journals()
+
     if parsed.r:
         if len(sources) != 1:
             raise Exception("Expected a source directory and a destination directory")
@@ -368,7 +882,8 @@ to be a directory.
         if not dest.isdir():
             raise Exception("Destination must be a directory")
 
-        return do_cp_r(context, source, dest)
+        with reporting(parsed):
+            return do_cp_r(context, source, dest, options)
 
     if len(sources) > 1:
         if not dest.isdir():
@@ -376,15 +891,16 @@ to be a directory.
                 "If copying multiple files, the destination must be a directory"
             )
 
-    for src in sources:
-        if src.isdir():
-            logger.warning(
-                f"Skipping copy of source {src.name()} because it is a directory. If you intended to recursively copy directory contents, use -r."
-            )
-            continue
-        if not timestamp_in_range(src.time(), earliest, latest):
-            continue
-        content = src.get()
-        dest.put(content, src.name())
+    with reporting(parsed), TransferScheduler(options.jobs) as scheduler:
+        for src in sources:
+            if src.isdir():
+                logger.warning(
+                    f"Skipping copy of source {src.name()} because it is a directory. If you intended to recursively copy directory contents, use -r."
+                )
+                continue
+            if not timestamp_in_range(src.time(), earliest, latest):
+                continue
+            get_stats().expect(src.size())
+            scheduler.submit(src.size(), lambda src=src: copy_file(src, dest, options))
 
     return True
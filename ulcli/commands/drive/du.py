@@ -0,0 +1,251 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Set
+
+import ulcli.argparser
+from loguru import logger
+from ulsdk.request_context import RequestContext
+
+from .api import get_cache, get_drive_context, get_parent
+from .cache import DriveCache, add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .cp import DriveEntry
+from .output import FORMATS, Column, RecordWriter
+from .rm import parse_pattern
+from .utils import format_size
+from .walk import DEFAULT_JOBS, WalkItem, walk
+
+DU_COLUMNS = [
+    Column("path", "string"),
+    Column("id", "string"),
+    Column("files", "int64"),
+    Column("dirs", "int64"),
+    Column("size", "int64"),
+]
+
+
+class DirUsage:
+    def __init__(self, entry: DriveEntry, path: str, depth: int, parent: Optional[uuid.UUID]):
+        self.entry = entry
+        self.path = path
+        self.depth = depth
+        self.parent = parent
+        # totals of everything below the directory
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        # the totals were taken from the subtotal cache rather than a listing
+        self.cached = False
+
+    def reuse(self, cache: Optional[DriveCache]) -> bool:
+        """Take the totals from cache, if it has them for the directory's current time"""
+        if cache is None:
+            return False
+        subtotal = cache.get_subtotal(self.entry.id(), self.entry.slot().time)
+        if subtotal is None:
+            return False
+        self.files, self.dirs, self.bytes = subtotal
+        self.cached = True
+        return True
+
+
+def outermost(
+    context: RequestContext, starts: List[DriveEntry], jobs: int = DEFAULT_JOBS
+) -> List[DriveEntry]:
+    """
+    The directories in starts, once each, leaving out those inside another
+    one of them, whose contents would otherwise be counted twice.
+    """
+    by_id: Dict[uuid.UUID, DriveEntry] = {}
+    for start in starts:
+        if start.isdir():
+            by_id.setdefault(start.id(), start)
+    if len(by_id) <= 1:
+        return list(by_id.values())
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        parents = list(pool.map(lambda start: start.parent(), by_id.values()))
+
+    # directories already found to be outside every start
+    outside: Set[uuid.UUID] = set()
+    result = []
+    for start, parent in zip(by_id.values(), parents):
+        chain = []
+        ancestor = parent
+        while ancestor != uuid.UUID(int=0) and ancestor not in by_id and ancestor not in outside:
+            chain.append(ancestor)
+            ancestor = get_parent(context, ancestor)
+
+        if ancestor in by_id:
+            logger.info(f"Skipping {start.name()}; it is inside {by_id[ancestor].name()}")
+        else:
+            outside.update(chain)
+            result.append(start)
+    return result
+
+
+def do_du(
+    starts: List[DriveEntry],
+    jobs: int = DEFAULT_JOBS,
+    cache: Optional[DriveCache] = None,
+    reuse_below: Optional[int] = None,
+) -> List[DirUsage]:
+    """
+    Total the files, directories and bytes below each directory in starts,
+    and below each directory inside them. starts must not be nested in one
+    another (see outermost). The subtotal of each directory that was listed
+    is stored in cache along with its parent directory, so that a change
+    below it can invalidate it. Directories at least reuse_below levels down
+    whose last modified time matches a stored subtotal aren't listed again,
+    so the directories inside them are left out of the result.
+    """
+    usage: Dict[uuid.UUID, DirUsage] = {}
+
+    def reused(dir: DirUsage) -> bool:
+        return reuse_below is not None and dir.depth >= reuse_below and dir.reuse(cache)
+
+    roots = []
+    for start in starts:
+        if not start.isdir() or start.id() in usage:
+            continue
+        dir = DirUsage(start, start.name(), 0, None)
+        usage[start.id()] = dir
+        if not reused(dir):
+            roots.append(start)
+
+    def descend(item: WalkItem) -> bool:
+        dir = DirUsage(item.entry, f"{item.root.name()}/{item.path}", item.depth, item.parent.id())
+        usage[item.entry.id()] = dir
+        return not reused(dir)
+
+    # the walk lists directories on its own workers but yields, and so calls
+    # descend, on this thread
+    for item in walk(roots, jobs, descend=descend):
+        if not item.entry.isdir():
+            parent = usage[item.parent.id()]
+            parent.files += 1
+            parent.bytes += item.entry.size()
+
+    # fold each directory into its parent, deepest first
+    dirs = sorted(usage.values(), key=lambda dir: -dir.depth)
+    for dir in dirs:
+        if dir.parent is not None:
+            parent = usage[dir.parent]
+            parent.files += dir.files
+            parent.dirs += dir.dirs + 1
+            parent.bytes += dir.bytes
+
+    if cache is not None:
+        for dir in dirs:
+            if not dir.cached:
+                cache.put_subtotal(
+                    dir.entry.id(), dir.entry.slot().time, dir.files, dir.dirs, dir.bytes, dir.parent
+                )
+
+    return sorted(dirs, key=lambda dir: dir.path)
+
+
+def write_usage(usage: List[DirUsage], format: str, out: BinaryIO):
+    with RecordWriter(format, DU_COLUMNS, out) as writer:
+        writer.write(
+            {
+                "path": [dir.path for dir in usage],
+                "id": [str(dir.entry.id()) for dir in usage],
+                "files": [dir.files for dir in usage],
+                "dirs": [dir.dirs for dir in usage],
+                "size": [dir.bytes for dir in usage],
+            }
+        )
+
+
+def drive_du(args: List[str]) -> bool:
+    epilog = """Example:
+    ul drive du -profile us -depth 1 050040d2-6a9e-344c-4dfa-93c18ad2bfaa
+
+Prints the number of files, directories and bytes below each directory, down
+to -depth levels below the given directories (all of them by default). The
+tree is listed -j directories at a time.
+
+With -reuse, a directory at the -depth limit (or below it) whose last
+modified time hasn't changed since du last measured it isn't listed again;
+its cached subtotal is used instead. This is only exact if the drive updates
+a directory's time when anything below it changes, so it is off by default.
+"""
+
+    parser = ulcli.argparser.ArgumentParser(
+        prog="ul drive du",
+        description="Show the space used by drive directories",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-depth",
+        help="show directories at most this many levels below the given ones. Totals always include everything below",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        help=f"number of directories to list concurrently. Defaults to {DEFAULT_JOBS}",
+        type=int,
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument(
+        "-reuse",
+        action="store_true",
+        help="reuse cached subtotals of directories at the -depth limit whose last modified time hasn't changed",
+    )
+    parser.add_argument(
+        "-format",
+        choices=FORMATS,
+        default="table",
+        help="output format. Defaults to table",
+    )
+    parser.add_argument(
+        "-output",
+        default="-",
+        help="file to write to instead of stdout",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="directory ids or <root id>:/path patterns to measure. Please quote all wildcards",
+    )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
+    parsed = parser.parse_args(args)
+
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+    if parsed.reuse and parsed.depth is None:
+        raise Exception("-reuse requires -depth, since every directory is shown otherwise")
+
+    context = get_drive_context(parsed)
+    starts: List[DriveEntry] = []
+    for path in parsed.paths:
+        entries = parse_pattern(context, path)
+        if len(entries) == 0:
+            raise ValueError(f"Invalid path: found 0 entries matching pattern {path}")
+        starts += entries
+
+    starts = outermost(context, starts, parsed.j)
+    # subtotals are recorded on every run, so that a later -reuse run can use them
+    usage = do_du(starts, parsed.j, get_cache(), parsed.depth if parsed.reuse else None)
+    shown = [dir for dir in usage if parsed.depth is None or dir.depth <= parsed.depth]
+    if parsed.output == "-":
+        sys.stdout.flush()
+        write_usage(shown, parsed.format, sys.stdout.buffer)
+    else:
+        with open(parsed.output, "wb") as out:
+            write_usage(shown, parsed.format, out)
+
+    for dir in usage:
+        if dir.depth == 0:
+            logger.info(f"{dir.path}: {dir.files} files, {dir.dirs} directories, {format_size(dir.bytes)}")
+    return True
@@ -0,0 +1,173 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import fnmatch
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+import ulcli.argparser
+from loguru import logger
+
+from .api import get_drive_context
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .cp import DriveEntry
+from .rm import parse_pattern
+from .utils import parse_size_arg, parse_timestamp_arg, timestamp_in_range
+from .walk import DEFAULT_JOBS, walk
+
+
+class FindFilter:
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        ty: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        earliest: Optional[int] = None,
+        latest: Optional[int] = None,
+    ):
+        self.name = name
+        self.ty = ty
+        self.min_size = min_size
+        self.max_size = max_size
+        self.earliest = earliest
+        self.latest = latest
+
+    def matches(self, entry: DriveEntry) -> bool:
+        if self.ty is not None and (self.ty == "d") != entry.isdir():
+            return False
+        if self.name is not None and not fnmatch.fnmatchcase(entry.name(), self.name):
+            return False
+        if self.min_size is not None and entry.size() < self.min_size:
+            return False
+        if self.max_size is not None and entry.size() > self.max_size:
+            return False
+        return timestamp_in_range(entry.time(), self.earliest, self.latest)
+
+
+def format_match(entry: DriveEntry, path: str, ids_only: bool) -> str:
+    if ids_only:
+        return str(entry.id())
+    time = datetime.utcfromtimestamp(entry.time()).strftime("%Y-%m-%d %H:%M:%S")
+    ty = "d" if entry.isdir() else "f"
+    return f"{ty}\t{time}\t{entry.size()}\t{entry.id()}\t{path}"
+
+
+def do_find(
+    starts: List[DriveEntry],
+    filter: FindFilter,
+    jobs: int = DEFAULT_JOBS,
+    max_depth: Optional[int] = None,
+    ids_only: bool = False,
+) -> int:
+    """
+    Print every entry in (and including) starts that matches filter, as soon
+    as its directory has been listed. Returns the number of matches.
+    """
+    matches = 0
+
+    def emit(entry: DriveEntry, path: str):
+        nonlocal matches
+        if filter.matches(entry):
+            matches += 1
+            sys.stdout.write(format_match(entry, path, ids_only) + "\n")
+
+    for start in starts:
+        emit(start, start.name())
+
+    for count, item in enumerate(walk(starts, jobs, max_depth)):
+        emit(item.entry, f"{item.root.name()}/{item.path}")
+        # keep piped output flowing without flushing on every line
+        if count % 1000 == 0:
+            sys.stdout.flush()
+
+    sys.stdout.flush()
+    return matches
+
+
+def drive_find(args: List[str]) -> bool:
+    epilog = """Examples:
+
+Files under an upload folder that haven't been modified since 2024:
+    ul drive find -profile us -type f -end 2024-01-01 '050040d2-6a9e-344c-4dfa-93c18ad2bfaa:/Dataset upload folder'
+
+Ids of every CSV larger than 100 MB in a directory tree, to feed to mv:
+    ul drive find -profile us -ids -name '*.csv' -min-size 100M 0500b351-a8ff-9be6-4294-952890075152 > ids.txt
+
+Each match is printed as "type, last modified (UTC), size, id, path", tab
+separated, as soon as the directory holding it has been listed. Directories
+are listed breadth first, -j at a time.
+"""
+
+    parser = ulcli.argparser.ArgumentParser(
+        prog="ul drive find",
+        description="Recursively search drive directories",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-name", help="only entries whose name matches this glob pattern")
+    parser.add_argument("-type", choices=["f", "d"], help="only files (f) or directories (d)")
+    parser.add_argument("-min-size", help="only entries at least this large, e.g. 512K, 100M or 2G")
+    parser.add_argument("-max-size", help="only entries at most this large, e.g. 512K, 100M or 2G")
+    parser.add_argument(
+        "-start",
+        help="Earliest last modified date of entries to show. Format: unix second or YYYY-MM-DD string (midnight local time)",
+    )
+    parser.add_argument(
+        "-end",
+        help="Latest last modified date of entries to show. Format: unix second or YYYY-MM-DD string (midnight local time)",
+    )
+    parser.add_argument(
+        "-maxdepth",
+        help="descend at most this many directory levels below the starting points",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        help=f"number of directories to list concurrently. Defaults to {DEFAULT_JOBS}",
+        type=int,
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument("-ids", action="store_true", help="print only the ids of matching entries")
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="directory ids or <root id>:/path patterns to search from. Please quote all wildcards",
+    )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
+    parsed = parser.parse_args(args)
+
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
+    earliest = parse_timestamp_arg(parsed.start)
+    latest = parse_timestamp_arg(parsed.end)
+    if earliest is not None and latest is not None and earliest > latest:
+        raise ValueError("Earliest timestamp must be less than latest timestamp")
+
+    filter = FindFilter(
+        name=parsed.name,
+        ty=parsed.type,
+        min_size=parse_size_arg(parsed.min_size),
+        max_size=parse_size_arg(parsed.max_size),
+        earliest=earliest,
+        latest=latest,
+    )
+
+    context = get_drive_context(parsed)
+    starts: List[DriveEntry] = []
+    for path in parsed.paths:
+        entries = parse_pattern(context, path)
+        if len(entries) == 0:
+            raise ValueError(f"Invalid path: found 0 entries matching pattern {path}")
+        starts += entries
+
+    matches = do_find(starts, filter, parsed.j, parsed.maxdepth, parsed.ids)
+    logger.info(f"Found {matches} matching entries")
+    return True
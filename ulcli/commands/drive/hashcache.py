@@ -0,0 +1,178 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Persistent cache of local file digests, so that unchanged files don't need to
+be re-hashed (or re-uploaded) on every run.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import BinaryIO, List, NamedTuple, Optional
+
+from loguru import logger
+
+# chunk size of uploads recorded before the chunk size was configurable
+LEGACY_CHUNK_SIZE = 96 * 1024 * 1024
+
+
+def cache_dir() -> str:
+    return os.path.join(Path.home(), ".ul", "cache")
+
+
+class FileDigests(NamedTuple):
+    chunk_size: int
+    # sha256 of each chunk, in order
+    chunks: List[str]
+    # sha256 over the chunk size and the chunk digests; two files with the same
+    # digest have the same content
+    digest: str
+
+
+def file_digest(chunk_size: int, chunks: List[str]) -> str:
+    h = hashlib.sha256()
+    h.update(str(chunk_size).encode("utf-8"))
+    for chunk in chunks:
+        h.update(bytes.fromhex(chunk))
+    return h.hexdigest()
+
+
+def _read_full(f: BinaryIO, view: memoryview) -> int:
+    """Fill view from f, stopping short only at the end of the file"""
+    filled = 0
+    while filled < len(view):
+        n = f.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def compute_digests(path: str, chunk_size: int) -> FileDigests:
+    # every chunk is read into the same buffer and hashed in place
+    chunks = []
+    buffer = memoryview(bytearray(chunk_size))
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = _read_full(f, buffer)
+            if n == 0:
+                break
+            chunks.append(hashlib.sha256(buffer[:n]).hexdigest())
+    return FileDigests(chunk_size, chunks, file_digest(chunk_size, chunks))
+
+
+class HashCache:
+    """
+    Digests are keyed by (path, inode, size, mtime_ns); any change to the file
+    invalidates its entry. The cache also remembers the digest of every file
+    uploaded to a drive directory, which lets a copy skip files the
+    destination already has.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            os.makedirs(cache_dir(), exist_ok=True)
+            path = os.path.join(cache_dir(), "hashes.sqlite")
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    inode INTEGER,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    chunk_size INTEGER,
+                    chunks TEXT,
+                    digest TEXT
+                )"""
+            )
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS uploads (
+                    parent TEXT,
+                    name TEXT,
+                    entry_id TEXT,
+                    digest TEXT,
+                    chunk_size INTEGER,
+                    PRIMARY KEY (parent, name)
+                )"""
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(uploads)")]
+            if "chunk_size" not in columns:
+                # caches written before the chunk size was configurable
+                self._db.execute("ALTER TABLE uploads ADD COLUMN chunk_size INTEGER")
+
+    def _current(self, path: str) -> Optional[tuple[int, str, str]]:
+        """The chunk size, chunk digests and digest cached for path, if it hasn't changed since"""
+        st = os.stat(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT inode, size, mtime_ns, chunk_size, chunks, digest FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+
+        if row is None:
+            return None
+        inode, size, mtime_ns, chunk_size, chunks, digest = row
+        if (inode, size, mtime_ns) != (st.st_ino, st.st_size, st.st_mtime_ns):
+            return None
+        return (chunk_size, chunks, digest)
+
+    def lookup(self, path: str, chunk_size: int) -> Optional[FileDigests]:
+        current = self._current(path)
+        if current is None or current[0] != chunk_size:
+            return None
+        return FileDigests(chunk_size, json.loads(current[1]), current[2])
+
+    def chunk_size(self, path: str) -> Optional[int]:
+        """The chunk size of the digests cached for path, if they are still valid"""
+        current = self._current(path)
+        return current[0] if current is not None else None
+
+    def store(self, path: str, digests: FileDigests):
+        st = os.stat(path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    st.st_ino,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    digests.chunk_size,
+                    json.dumps(digests.chunks),
+                    digests.digest,
+                ),
+            )
+
+    def digests(self, path: str, chunk_size: int) -> FileDigests:
+        digests = self.lookup(path, chunk_size)
+        if digests is None:
+            logger.debug(f"Hashing {path}")
+            digests = compute_digests(path, chunk_size)
+            self.store(path, digests)
+        return digests
+
+    def record_upload(self, parent: uuid.UUID, name: str, entry_id: uuid.UUID, digests: FileDigests):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                (str(parent), name, str(entry_id), digests.digest, digests.chunk_size),
+            )
+
+    def uploaded(self, parent: uuid.UUID, name: str) -> Optional[tuple[uuid.UUID, int, str]]:
+        """The entry id, chunk size and digest of the last upload to parent/name"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT entry_id, chunk_size, digest FROM uploads WHERE parent = ? AND name = ?",
+                (str(parent), name),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return (uuid.UUID(row[0]), row[1] or LEGACY_CHUNK_SIZE, row[2])
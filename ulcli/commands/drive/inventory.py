@@ -0,0 +1,153 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import sys
+from typing import Any, Dict, List, Optional
+
+import ulcli.argparser
+from loguru import logger
+
+from .api import get_drive_context
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .cp import DriveEntry
+from .ls import format_permissions, slot_type
+from .output import BATCH_SIZE, FORMATS, Column, RecordWriter
+from .rm import parse_pattern
+from .utils import format_size
+from .walk import DEFAULT_JOBS, walk
+
+INVENTORY_COLUMNS = [
+    Column("id", "string"),
+    Column("parent_id", "string"),
+    Column("name", "string"),
+    Column("path", "string"),
+    Column("type", "string"),
+    Column("size", "int64"),
+    Column("time", "timestamp_ms"),
+    Column("permissions", "string"),
+]
+
+
+class InventoryBatch:
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {column.name: [] for column in INVENTORY_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def add(self, entry: DriveEntry, parent: Optional[DriveEntry], path: str):
+        slot = entry.slot()
+        self.columns["id"].append(str(entry.id()))
+        self.columns["parent_id"].append(str(parent.id()) if parent is not None else None)
+        self.columns["name"].append(slot.name)
+        self.columns["path"].append(path)
+        self.columns["type"].append(slot_type(slot))
+        self.columns["size"].append(slot.size)
+        self.columns["time"].append(slot.time)
+        self.columns["permissions"].append(format_permissions(slot.user_permissions))
+
+
+def do_inventory(
+    starts: List[DriveEntry],
+    writer: RecordWriter,
+    jobs: int = DEFAULT_JOBS,
+) -> int:
+    """
+    Write a record for every entry in (and including) starts to writer, a
+    batch at a time while the tree is being crawled. Returns the number of
+    records written. The starting entries have no parent id.
+    """
+    count = 0
+    size = 0
+    batch = InventoryBatch()
+
+    def flush():
+        nonlocal batch
+        writer.write(batch.columns)
+        batch = InventoryBatch()
+
+    for start in starts:
+        batch.add(start, None, start.name())
+
+    for item in walk(starts, jobs):
+        batch.add(item.entry, item.parent, f"{item.root.name()}/{item.path}")
+        if not item.entry.isdir():
+            size += item.entry.size()
+        if len(batch) >= BATCH_SIZE:
+            count += len(batch)
+            flush()
+            logger.info(f"Inventoried {count} entries ({format_size(size)})")
+
+    count += len(batch)
+    flush()
+    logger.info(f"Inventoried {count} entries ({format_size(size)})")
+    return count
+
+
+def drive_inventory(args: List[str]) -> bool:
+    epilog = """Example:
+    ul drive inventory -profile us -output snapshot.parquet 050040d2-6a9e-344c-4dfa-93c18ad2bfaa
+
+Crawls the given directories, -j listings at a time, and writes one record
+per entry (the directories themselves included) with its id, parent id, name,
+path, type, size, last modified time and your permissions on it. Records are
+written as the crawl progresses. The snapshot can then be queried locally,
+e.g. with pyarrow, pandas or duckdb.
+"""
+
+    parser = ulcli.argparser.ArgumentParser(
+        prog="ul drive inventory",
+        description="Write a snapshot of the metadata of a drive tree",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-format",
+        choices=[format for format in FORMATS if format != "table"],
+        default="parquet",
+        help="snapshot format. Defaults to parquet",
+    )
+    parser.add_argument(
+        "-output",
+        required=True,
+        help="file to write the snapshot to, or - for stdout",
+    )
+    parser.add_argument(
+        "-j",
+        help=f"number of directories to list concurrently. Defaults to {DEFAULT_JOBS}",
+        type=int,
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="directory ids or <root id>:/path patterns to crawl. Please quote all wildcards",
+    )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
+    parsed = parser.parse_args(args)
+
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
+    context = get_drive_context(parsed)
+    starts: List[DriveEntry] = []
+    for path in parsed.paths:
+        entries = parse_pattern(context, path)
+        if len(entries) == 0:
+            raise ValueError(f"Invalid path: found 0 entries matching pattern {path}")
+        starts += entries
+
+    if parsed.output == "-":
+        sys.stdout.flush()
+        with RecordWriter(parsed.format, INVENTORY_COLUMNS, sys.stdout.buffer) as writer:
+            do_inventory(starts, writer, parsed.j)
+    else:
+        with open(parsed.output, "wb") as out, RecordWriter(
+            parsed.format, INVENTORY_COLUMNS, out
+        ) as writer:
+            do_inventory(starts, writer, parsed.j)
+    return True
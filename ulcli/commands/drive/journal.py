@@ -0,0 +1,184 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+On-disk journal of in-progress chunked uploads, so that an interrupted upload
+can be resumed by re-running the same copy.
+
+Each journal is a JSON-lines file: a header naming the source file, the
+destination, the chunk size and the drive entry being uploaded into, followed
+by one [index, sha256] line per acknowledged chunk. Acknowledgements are
+appended, so recording one costs the same however large the file is; a line
+cut short by a crash is ignored when the journal is read back.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+
+def journal_dir() -> str:
+    return os.path.join(Path.home(), ".ul", "journal")
+
+
+def _identity(source_path: str, parent: uuid.UUID, filename: str) -> Dict[str, Any]:
+    st = os.stat(source_path)
+    return {
+        "source": source_path,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "parent": str(parent),
+        "filename": filename,
+    }
+
+
+def _journal_path(identity: Dict[str, Any]) -> str:
+    key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(journal_dir(), key + ".json")
+
+
+def _read_state(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            state = json.loads(f.readline())
+            # journals written before acknowledgements were appended keep
+            # their chunks in the header
+            chunks = {int(index): hash for index, hash in state.get("chunks", {}).items()}
+            for line in f:
+                try:
+                    index, hash = json.loads(line)
+                except ValueError:
+                    break
+                chunks[int(index)] = hash
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Ignoring unreadable upload journal {path}: {e}")
+        return None
+
+    state["chunks"] = chunks
+    return state
+
+
+def _matches_source(identity: Dict[str, Any]) -> bool:
+    try:
+        st = os.stat(identity["source"])
+    except (OSError, KeyError, TypeError):
+        return False
+    return st.st_size == identity.get("size") and st.st_mtime_ns == identity.get("mtime_ns")
+
+
+def prune_journals():
+    """
+    Delete the journals of uploads that can no longer be resumed, because
+    their source file has been changed or removed since they were written.
+    """
+    try:
+        names = os.listdir(journal_dir())
+    except FileNotFoundError:
+        return
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(journal_dir(), name)
+        state = _read_state(path)
+        if state is not None and _matches_source(state.get("identity") or {}):
+            continue
+        logger.debug(f"Removing stale upload journal {path}")
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def journaled_chunk_size(source_path: str, parent: uuid.UUID, filename: str) -> Optional[int]:
+    """The chunk size of an interrupted upload of source_path, if there is one"""
+    identity = _identity(source_path, parent, filename)
+    state = _read_state(_journal_path(identity))
+    if state is None or state.get("identity") != identity:
+        return None
+    return state.get("chunk_size")
+
+
+class UploadJournal:
+    """
+    Records the drive entry created for an upload of a local file, the chunk
+    size used, and the sha256 of every chunk the server has acknowledged. The
+    journal is identified by the source file (path, size, mtime) and the upload
+    destination (parent, filename); if the file changes it no longer matches
+    and the upload starts over.
+    """
+
+    def __init__(
+        self,
+        source_path: str,
+        parent: uuid.UUID,
+        filename: str,
+        chunk_size: int,
+    ):
+        self._identity = _identity(source_path, parent, filename)
+        self._path = _journal_path(self._identity)
+        self._chunk_size = chunk_size
+        self._entry_id: Optional[uuid.UUID] = None
+        self._chunks: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        state = _read_state(self._path)
+        if state is None or state.get("identity") != self._identity:
+            return
+        if state.get("chunk_size") != self._chunk_size:
+            logger.info(
+                f"Chunk size changed since the last upload of {self._identity['source']}; starting over"
+            )
+            return
+
+        self._entry_id = uuid.UUID(state["entry_id"])
+        self._chunks = state["chunks"]
+
+    def _write_header(self):
+        state = {
+            "identity": self._identity,
+            "chunk_size": self._chunk_size,
+            "entry_id": str(self._entry_id),
+        }
+        os.makedirs(journal_dir(), exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(state) + "\n")
+        os.replace(tmp_path, self._path)
+
+    def entry_id(self) -> Optional[uuid.UUID]:
+        return self._entry_id
+
+    def begin(self, entry_id: uuid.UUID):
+        with self._lock:
+            self._entry_id = entry_id
+            self._chunks = {}
+            self._write_header()
+
+    def is_committed(self, index: int, hash: str) -> bool:
+        with self._lock:
+            return self._chunks.get(index) == hash
+
+    def ack(self, index: int, hash: str):
+        with self._lock:
+            self._chunks[index] = hash
+            with open(self._path, "a") as f:
+                f.write(json.dumps([index, hash]) + "\n")
+
+    def finish(self):
+        with self._lock:
+            self._entry_id = None
+            self._chunks = {}
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
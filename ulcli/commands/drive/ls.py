@@ -1,12 +1,12 @@
 # Copyright (c), CommunityLogiq Software
 
-from typing import List
-from datetime import datetime
-from tabulate import tabulate
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+from functools import lru_cache
 
-from ulcli.commands.common import get_api_context, uuid_from_id
+from ulcli.commands.common import uuid_from_id
 import ulcli.argparser
-from ulsdk.api.drive import ls, get_roots
 from ulsdk.types.fs import (
     ListSlot,
     ListFile,
@@ -16,39 +16,68 @@ from ulsdk.types.fs import (
 )
 from ulsdk.types.generated.PermissionTy import PermissionTy
 
+from .api import get_drive_context, get_roots, ls
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .output import BATCH_SIZE, FORMATS, Column, RecordWriter
 
-def parse_slot(slot: ListSlot) -> List[str]:
-    ty = "<unknown>"
-    if isinstance(slot.entry.value, ListFile):
-        ty = "File"
-    elif isinstance(slot.entry.value, ListDirectory):
-        ty = "Directory"
-    elif isinstance(slot.entry.value, ListObject):
-        ty = "Object"
-    elif isinstance(slot.entry.value, TopLevelDirectory):
-        ty = "Directory"
-
-    time = datetime.utcfromtimestamp(slot.time / 1000).strftime("%Y-%m-%d %H:%M:%S")
-    slot_perm = slot.user_permissions
-    perms = PermissionTy()
-    permissions = ""
-    if slot_perm & perms.PERM_BROWSE:
-        permissions += "B"
-    if slot_perm & perms.PERM_READ:
-        permissions += "R"
-    if slot_perm & perms.PERM_APPEND:
-        permissions += "A"
-    if slot_perm & perms.PERM_MODIFY:
-        permissions += "M"
-
-    size = str(slot.size)
+# number of paths listed at once
+LIST_CONCURRENCY = 8
+
+PERMISSION_FLAGS = [
+    (PermissionTy.PERM_BROWSE, "B"),
+    (PermissionTy.PERM_READ, "R"),
+    (PermissionTy.PERM_APPEND, "A"),
+    (PermissionTy.PERM_MODIFY, "M"),
+]
+
+SLOT_TYPES = {
+    ListFile: "File",
+    ListDirectory: "Directory",
+    ListObject: "Object",
+    TopLevelDirectory: "Directory",
+}
+
+SLOT_COLUMNS = [
+    Column("type", "string"),
+    Column("permissions", "string"),
+    Column("time", "timestamp_ms"),
+    Column("size", "int64"),
+    Column("id", "string"),
+    Column("name", "string"),
+]
+
+
+def slot_type(slot: ListSlot) -> str:
+    return SLOT_TYPES.get(type(slot.entry.value), "<unknown>")
+
+
+@lru_cache(maxsize=None)
+def format_permissions(slot_perm: int) -> str:
+    return "".join(flag for perm, flag in PERMISSION_FLAGS if slot_perm & perm)
+
+
+def slot_id(slot: ListSlot) -> str:
     id = uuid_from_id(slot.id)
-    if id is None:
-        id_str = "<unknown>"
-    else:
-        id_str = str(id)
+    return "<unknown>" if id is None else str(id)
+
+
+def slot_batch(slots: List[ListSlot]) -> Dict[str, List[Any]]:
+    """The SLOT_COLUMNS of slots, one list per column"""
+    return {
+        "type": [slot_type(slot) for slot in slots],
+        "permissions": [format_permissions(slot.user_permissions) for slot in slots],
+        "time": [slot.time for slot in slots],
+        "size": [slot.size for slot in slots],
+        "id": [slot_id(slot) for slot in slots],
+        "name": [slot.name for slot in slots],
+    }
 
-    return [ty, permissions, time, size, id_str, slot.name]
+
+def write_slots(writer: RecordWriter, slots: List[ListSlot]):
+    for start in range(0, len(slots), BATCH_SIZE):
+        writer.write(slot_batch(slots[start : start + BATCH_SIZE]))
 
 
 # Example usage:
@@ -64,46 +93,74 @@ def drive_ls(args: List[str]):
         help="show files in the unioned drive search space",
     )
     parser.add_argument("-me", action="store_true", help="show files in your drive")
+    parser.add_argument(
+        "-format",
+        choices=FORMATS,
+        default="table",
+        help="output format. Every format but table is written as listings arrive. Defaults to table",
+    )
+    parser.add_argument(
+        "-output",
+        help="file to write the listing to. Defaults to stdout",
+        default=None,
+    )
     parser.add_argument(
         "paths", nargs="*", help="ls pattern. please quote all wildcards"
     )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
     if parsed.union and parsed.me:
         raise Exception("cannot specify both -union and -me; pick one!")
 
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
 
-    results = []
-    if len(parsed.paths) == 0:
-        roots = get_roots(context)
-        results += roots.slots
+    def split_path(path: str) -> Tuple[str, str]:
+        if parsed.union:
+            return ("union", path)
+        if parsed.me:
+            return ("me", path)
 
-    for path in parsed.paths:
-        status_msg = f"Gathering {path}"
-        print(status_msg, end="\r")
+        slash_idx = path.find("/")
+        if slash_idx == -1:
+            return (path, "")
+        return (path[:slash_idx], path[slash_idx + 1 :])
 
-        if parsed.union:
-            res = ls(context, "union", path)
-            results += res.slots
-        elif parsed.me:
-            res = ls(context, "me", path)
-            results += res.slots
-        else:
-            slash_idx = path.find("/")
-            root = path
-            if slash_idx != -1:
-                root = path[:slash_idx]
-                path = path[slash_idx + 1 :]
+    def write_listings(writer: RecordWriter):
+        # the SDK's calls block, so the paths are listed on a thread pool
+        with ThreadPoolExecutor(max_workers=LIST_CONCURRENCY) as pool:
+            listings = [pool.submit(ls, context, *split_path(path)) for path in parsed.paths]
+            if parsed.format == "table":
+                # the table is rendered at the end, in the order paths were given
+                for listing in listings:
+                    write_slots(writer, listing.result().slots)
             else:
-                path = ""
-            res = ls(context, root, path)
-            results += res.slots
+                for listing in as_completed(listings):
+                    write_slots(writer, listing.result().slots)
 
-        # clear the line of all the "gathering" text
-        print(" " * len(status_msg), end="\r")
+    def write_all(out):
+        with RecordWriter(parsed.format, SLOT_COLUMNS, out) as writer:
+            if len(parsed.paths) == 0:
+                write_slots(writer, get_roots(context).slots)
+            elif parsed.format == "table" and parsed.output is None:
+                if len(parsed.paths) == 1:
+                    status_msg = f"Gathering {parsed.paths[0]}"
+                else:
+                    status_msg = f"Gathering {len(parsed.paths)} paths"
+                print(status_msg, end="\r", flush=True)
 
-    table = map(parse_slot, results)
-    print(
-        tabulate(table, headers=["Type", "Permissions", "Time", "Size", "Id", "Name"])
-    )
+                write_listings(writer)
+
+                # clear the line of all the "gathering" text
+                print(" " * len(status_msg), end="\r", flush=True)
+            else:
+                write_listings(writer)
+
+    if parsed.output is None:
+        sys.stdout.flush()
+        write_all(sys.stdout.buffer)
+    else:
+        with open(parsed.output, "wb") as out:
+            write_all(out)
     return True
@@ -5,9 +5,11 @@ from uuid import UUID
 from loguru import logger
 
 import ulcli.argparser
-from ulsdk.api.drive import create_entry
 from ulsdk.types.id import ObjectId
-from ulcli.commands.common import get_api_context
+from .api import get_drive_context, create_entry
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
 
 
 def drive_mkdir(args: List[str]):
@@ -18,8 +20,11 @@ def drive_mkdir(args: List[str]):
         "-parent", help="id of the drive directory in which to create this directory"
     )
     parser.add_argument("name", help="name of the directory to create")
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
 
     parent = parsed.parent
     name = parsed.name
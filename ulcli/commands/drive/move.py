@@ -1,19 +1,78 @@
 # Copyright (c), CommunityLogiq Software
 
 import argparse
+import sys
 import uuid
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
 from loguru import logger
 
 import ulcli.argparser
 from ulsdk.request_context import RequestContext
-from ulsdk.api.drive import ls, move
-from ulsdk.types.fs import MoveRequest
 from ulsdk.types.id import ObjectId
-from ulcli.commands.common import get_api_context, is_uuid, uuid_from_id
+from ulcli.commands.common import is_uuid, uuid_from_id
+from .api import get_drive_context, ls, move
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .stats import add_stats_arguments, get_stats, reporting
 from .utils import parse_timestamp_arg, timestamp_in_range
 
 
+class MoveSummary(NamedTuple):
+    moved: int
+    # (name or id, error) of every item that could not be moved
+    failed: List[Tuple[str, str]]
+
+
+def move_items(
+    context: RequestContext,
+    items: List[Tuple[str, ObjectId]],
+    target: str,
+    overwrite: bool,
+    jobs: int = 1,
+) -> MoveSummary:
+    """
+    Move every (label, id) item into target, running up to jobs moves at a
+    time. A failed move doesn't stop the others; failures are returned in the
+    summary.
+    """
+    target_id = ObjectId.from_uuid(target)
+
+    def move_one(label: str, obj_id: ObjectId) -> Optional[Tuple[str, str]]:
+        logger.info(f"Moving {label} to {target} with overwrite={overwrite}")
+        try:
+            with get_stats().file(label, 0):
+                move(context, obj_id, target_id, overwrite)
+        except Exception as e:
+            logger.error(f"Failed to move {label}: {e}")
+            return (label, str(e))
+        return None
+
+    for _ in items:
+        get_stats().expect(0)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        errors = list(pool.map(lambda item: move_one(*item), items))
+
+    failed = [error for error in errors if error is not None]
+    return MoveSummary(len(items) - len(failed), failed)
+
+
+def do_move_ids(
+    context: RequestContext,
+    sources: List[str],
+    target: str,
+    overwrite: bool,
+    jobs: int = 1,
+) -> MoveSummary:
+    invalid = [source for source in sources if not is_uuid(source)]
+    if len(invalid) > 0:
+        raise ValueError(f"Invalid source ids: {', '.join(invalid[:10])}")
+
+    items = [(source, ObjectId.from_uuid(source)) for source in sources]
+    return move_items(context, items, target, overwrite, jobs)
+
+
 def do_move(
     context: RequestContext,
     source: str,
@@ -21,7 +80,8 @@ def do_move(
     overwrite: bool,
     earliest_timestamp: int | None = None,
     latest_timestamp: int | None = None,
-) -> None:
+    jobs: int = 1,
+) -> MoveSummary:
     target_id = ObjectId.from_uuid(target)
 
     # Source is a single file or single directory, provided as an id
@@ -31,17 +91,7 @@ def do_move(
                 "Cannot provide earliest or latest timestamp when moving a single item by id!"
             )
 
-        logger.info(f"Moving {source} to {target} with overwrite={overwrite}")
-        source_id = ObjectId.from_uuid(source)
-
-        move_request = MoveRequest(
-            None,
-            target_id,
-            source_id,
-            overwrite,
-        )
-        move(context, move_request)
-        return
+        return do_move_ids(context, [source], target, overwrite)
 
     splits = source.split("/")
     logger.info(f"source: {source}, splits: {splits}")
@@ -55,10 +105,9 @@ def do_move(
         raise ValueError(f"Invalid root id: {root_id}")
 
     result = ls(context, root_id, splits[1])
-    items = result.slots
 
-    num_moved = 0
-    for item in items:
+    items = []
+    for item in result.slots:
         obj_id = item.id
         if obj_id is None:
             continue
@@ -74,18 +123,18 @@ def do_move(
             logger.info(f"Not moving {item.name} ({obj_id}) to {target} as it is the target directory")
             continue
 
-        logger.info(f"Moving {item.name} to {target} with overwrite={overwrite}")
+        items.append((item.name, obj_id))
+
+    return move_items(context, items, target, overwrite, jobs)
 
-        move_request = MoveRequest(
-            None,
-            target_id,
-            obj_id,
-            overwrite,
-        )
-        move(context, move_request)
-        num_moved += 1
 
-    logger.info(f"Moved {num_moved} items to {target}")
+def read_ids(path: str) -> List[str]:
+    if path == "-":
+        content = sys.stdin.read()
+    else:
+        with open(path, "r") as f:
+            content = f.read()
+    return content.split()
 
 
 def drive_move(args: List[str]):
@@ -104,6 +153,11 @@ DIRECTORY CONTENT BY FILE NAME PATTERN
 Move every file in 0500e590-2309-85ae-4404-bf0a63e56483 whose file name starts with the string "test", into 050077f4-588b-45ba-46ee-a108a0fa2fcc:
 ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/test*" 050077f4-588b-45ba-46ee-a108a0fa2fcc
 
+MANY IDS
+Move every id listed (whitespace separated) in ids.txt into 050077f4-588b-45ba-46ee-a108a0fa2fcc, 16 at a time:
+ul drive mv -env prod -region ca -j 16 -from-file ids.txt 050077f4-588b-45ba-46ee-a108a0fa2fcc
+cat ids.txt | ul drive mv -env prod -region ca -j 16 -from-file - 050077f4-588b-45ba-46ee-a108a0fa2fcc
+
 DIRECTORY CONTENT BY LAST MODIFIED DATE RANGE
 Move every file in 0500e590-2309-85ae-4404-bf0a63e56483 whose last modified date is between 2024-01-01 and 2024-02-01, into 050077f4-588b-45ba-46ee-a108a0fa2fcc:
 ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/*" 050077f4-588b-45ba-46ee-a108a0fa2fcc -start 2024-01-01 -end 2024-02-01
@@ -117,6 +171,7 @@ ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/*" 050077
     )
     parser.add_argument(
         "source",
+        nargs="?",
         help="drive file(s) or directory(s) to move. Can be a single id, or a glob pattern rooted at a drive directory id",
     )
     parser.add_argument("target", help="id of the destination directory")
@@ -125,6 +180,17 @@ ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/*" 050077
         action="store_true",
         help="overwrite upon naming conflict. Defaults to false",
     )
+    parser.add_argument(
+        "-from-file",
+        help="file of whitespace separated ids to move, or - to read them from stdin. Replaces the source argument",
+    )
+    parser.add_argument(
+        "-j",
+        help="number of moves to run concurrently. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    add_stats_arguments(parser)
     parser.add_argument(
         "-start",
         help="Earliest last modified date of files to move. Format: unix millisecond or YYYY-MM-DD string (midnight local time)",
@@ -134,9 +200,12 @@ ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/*" 050077
         help="Latest last modified date of files to move. Format: unix millisecond or YYYY-MM-DD string (midnight local time)",
     )
 
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
 
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
 
     target = parsed.target
     assert uuid.UUID(target)
@@ -147,6 +216,32 @@ ul drive mv -env prod -region ca "0500e590-2309-85ae-4404-bf0a63e56483/*" 050077
     if earliest is not None and latest is not None and earliest > latest:
         raise Exception("Earliest timestamp must be less than latest timestamp")
 
-    do_move(context, parsed.source, target, parsed.overwrite, earliest, latest)
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
+    if parsed.from_file is not None:
+        if parsed.source is not None:
+            raise Exception("Specify either a source or -from-file, not both")
+        if earliest is not None or latest is not None:
+            raise Exception("-start and -end can't be used with -from-file")
+
+        sources = read_ids(parsed.from_file)
+        with reporting(parsed):
+            summary = do_move_ids(context, sources, target, parsed.overwrite, parsed.j)
+    else:
+        if parsed.source is None:
+            raise Exception("A source or -from-file is required")
+
+        with reporting(parsed):
+            summary = do_move(
+                context, parsed.source, target, parsed.overwrite, earliest, latest, parsed.j
+            )
+
+    logger.info(f"Moved {summary.moved} items to {target}")
+    if len(summary.failed) > 0:
+        logger.error(f"Failed to move {len(summary.failed)} items:")
+        for label, error in summary.failed:
+            logger.error(f"    {label}: {error}")
+        return False
 
     return True
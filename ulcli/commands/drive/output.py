@@ -0,0 +1,111 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Writers for tabular command output. Records are written in batches, given as
+one list of values per column, and every format but the human readable table
+is written out batch by batch as it arrives. The csv, arrow (IPC stream) and
+parquet formats are built column-wise with pyarrow, which is only imported
+when one of them is used.
+"""
+
+import json
+import time
+from typing import Any, BinaryIO, Dict, List, NamedTuple
+
+FORMATS = ["table", "ndjson", "csv", "arrow", "parquet"]
+
+# number of records written at a time by commands that produce many
+BATCH_SIZE = 10000
+
+
+class Column(NamedTuple):
+    name: str
+    # "string", "int64" or "timestamp_ms" (milliseconds since the epoch)
+    ty: str
+
+
+def _arrow_schema(columns: List[Column]):
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "timestamp_ms": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema([(column.name, types[column.ty]) for column in columns])
+
+
+class RecordWriter:
+    def __init__(self, format: str, columns: List[Column], out: BinaryIO):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format}; expected one of {', '.join(FORMATS)}")
+
+        self._format = format
+        self._columns = columns
+        self._out = out
+        self._rows: List[List[Any]] = []
+        self._writer: Any = None
+        self._schema: Any = None
+
+        if format in ["csv", "arrow", "parquet"]:
+            import pyarrow.csv
+            import pyarrow.ipc
+            import pyarrow.parquet
+
+            self._schema = _arrow_schema(columns)
+            if format == "csv":
+                self._writer = pyarrow.csv.CSVWriter(out, self._schema)
+            elif format == "arrow":
+                self._writer = pyarrow.ipc.new_stream(out, self._schema)
+            else:
+                self._writer = pyarrow.parquet.ParquetWriter(out, self._schema)
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _formatted(self, batch: Dict[str, List[Any]], time_format: str) -> List[List[Any]]:
+        values = []
+        for column in self._columns:
+            if column.ty == "timestamp_ms":
+                values.append(
+                    [time.strftime(time_format, time.gmtime(ms / 1000)) for ms in batch[column.name]]
+                )
+            else:
+                values.append(batch[column.name])
+        return [list(row) for row in zip(*values)]
+
+    def write(self, batch: Dict[str, List[Any]]):
+        if len(batch[self._columns[0].name]) == 0:
+            return
+
+        if self._format == "table":
+            self._rows += self._formatted(batch, "%Y-%m-%d %H:%M:%S")
+        elif self._format == "ndjson":
+            names = [column.name for column in self._columns]
+            lines = [
+                json.dumps(dict(zip(names, row))) + "\n"
+                for row in self._formatted(batch, "%Y-%m-%dT%H:%M:%SZ")
+            ]
+            self._out.write("".join(lines).encode("utf-8"))
+        else:
+            import pyarrow as pa
+
+            self._writer.write_batch(
+                pa.record_batch([batch[column.name] for column in self._columns], schema=self._schema)
+            )
+        self._out.flush()
+
+    def close(self):
+        if self._format == "table":
+            from tabulate import tabulate
+
+            headers = [column.name.capitalize() for column in self._columns]
+            self._out.write((tabulate(self._rows, headers=headers) + "\n").encode("utf-8"))
+            self._rows = []
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._out.flush()
@@ -5,11 +5,12 @@ from typing import List
 from loguru import logger
 import uuid
 
-from ulcli.commands.common import get_api_context
 import ulcli.argparser
-from ulsdk.api.drive import move
 from ulsdk.types.id import ObjectId
-from ulsdk.types.fs import MoveRequest
+from .api import get_drive_context, move
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
 
 
 def drive_rename(args: List[str]):
@@ -33,14 +34,16 @@ def drive_rename(args: List[str]):
         action="store_true",
         help="overwrite the destination if it already exists. Defaults to false",
     )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
 
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
 
     logger.info(
         f"Renaming {parsed.id} to {parsed.name} with overwrite={parsed.overwrite}"
     )
     id = ObjectId.from_uuid(parsed.id)
-    move_request = MoveRequest(parsed.Name, None, id, parsed.overwrite)
-    move(context, move_request)
+    move(context, id, None, parsed.overwrite, parsed.name)
     return True
@@ -0,0 +1,141 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Retry policy for the drive API calls made in api.py.
+
+Failed calls are retried with exponential backoff and full jitter, waiting at
+least as long as the server asks for with a Retry-After header. Calls that
+are safe to repeat (reads, unlink, chunk uploads) are retried on any
+transient error. Calls that could take effect twice (create_entry, move) are
+only retried when the server says it didn't process the request (429, 503,
+514) or the connection was never made. Every retry made during a run draws
+from a shared budget, so a server that is down fails the run promptly rather
+than stalling every worker through its own retries.
+"""
+
+import datetime
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from loguru import logger
+from requests import ConnectionError, ConnectTimeout, HTTPError, Response, Timeout
+
+import ulcli.argparser
+
+from .tracing import span
+
+MAX_ATTEMPTS = 8
+BASE_DELAY = 0.25
+MAX_DELAY = 30.0
+# longest Retry-After we are willing to honour
+MAX_RETRY_AFTER = 120.0
+DEFAULT_BUDGET = 200
+
+# the server didn't act on the request, so it is safe to send again
+UNPROCESSED_STATUSES = {429, 503, 514}
+# the request may have been acted on; only idempotent calls are repeated
+TRANSIENT_STATUSES = {500, 502, 504}
+
+T = TypeVar("T")
+
+
+def add_retry_arguments(parser):
+    """Add the retry budget argument to a drive command's parser"""
+    parser.add_argument(
+        "-retry-budget",
+        type=int,
+        default=ulcli.argparser.common_default("retry_budget", DEFAULT_BUDGET),
+        help=f"most failed drive API calls retried over the whole run. Defaults to {DEFAULT_BUDGET}",
+    )
+
+
+class RetryBudget:
+    def __init__(self, retries: int = DEFAULT_BUDGET):
+        self._lock = threading.Lock()
+        self._remaining = retries
+        self._used = 0
+        self._warned = False
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                if not self._warned:
+                    logger.warning("The retry budget for this run is exhausted; failing calls won't be retried")
+                    self._warned = True
+                return False
+            self._remaining -= 1
+            self._used += 1
+            return True
+
+    def used(self) -> int:
+        with self._lock:
+            return self._used
+
+
+_budget = RetryBudget()
+
+
+def configure_budget(budget: RetryBudget):
+    global _budget
+    _budget = budget
+
+
+def get_budget() -> RetryBudget:
+    return _budget
+
+
+def retry_after(response: Optional[Response]) -> Optional[float]:
+    """Seconds the server asked us to wait, from its Retry-After header"""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def is_retryable(error: Exception, idempotent: bool) -> bool:
+    if isinstance(error, HTTPError):
+        if error.response is None:
+            return False
+        status = error.response.status_code
+        return status in UNPROCESSED_STATUSES or (idempotent and status in TRANSIENT_STATUSES)
+
+    # the request never reached the server
+    if isinstance(error, ConnectTimeout):
+        return True
+    return idempotent and isinstance(error, (ConnectionError, Timeout))
+
+
+def backoff(attempt: int) -> float:
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt))
+
+
+def call_with_retry(name: str, fn: Callable[[], T], idempotent: bool) -> T:
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS or not is_retryable(e, idempotent) or not _budget.take():
+                raise e
+
+            delay = backoff(attempt)
+            if isinstance(e, HTTPError):
+                delay = max(delay, retry_after(e.response) or 0.0)
+            logger.warning(f"{name} failed ({e}); retrying in {delay:.2f}s")
+            with span("retry backoff", "retry", {"call": name, "attempt": attempt}):
+                time.sleep(delay)
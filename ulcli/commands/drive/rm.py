@@ -3,29 +3,98 @@ import argparse
 import urllib.parse
 import ulcli.argparser
 
-from typing import List
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
 from loguru import logger
-from ulsdk.api.drive import ls
-from ulcli.commands.common import get_api_context
 from ulsdk.request_context import RequestContext
 
-from .utils import is_directory_entry_id, parse_timestamp_arg, timestamp_in_range
+from .api import get_drive_context, ls
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .utils import format_size, is_directory_entry_id, parse_timestamp_arg, timestamp_in_range
 from .cp import get_dir_list_slot, DriveEntry
+from .stats import add_stats_arguments, get_stats, reporting
+from .walk import DEFAULT_JOBS, WalkItem, walk
 
 
-def do_rm_r(context: RequestContext, source: DriveEntry) -> bool:
-    if source.isdir():
-        src_entries = source.collect()
-        if len(src_entries) == 0:
-            logger.info(f"Nothing to delete: '{source.name()}' is already empty")
-            return True
-        logger.info(f"Deleting all content for directory '{source.name()}'")
-        for src in src_entries:
-            do_rm_r(context, src)
-    else:
-        logger.info(f"Deleting {source.name()}")
-        source.rm()
-    return True
+class RmSummary(NamedTuple):
+    files: int
+    dirs: int
+    bytes: int
+
+
+def remove_entries(entries: List[DriveEntry], jobs: int, dry_run: bool) -> RmSummary:
+    """Remove entries that aren't directories, up to jobs at a time"""
+
+    def remove(entry: DriveEntry):
+        logger.info(f"{'Would delete' if dry_run else 'Deleting'} {entry.name()}")
+        with get_stats().file(entry.name(), 0):
+            if not dry_run:
+                entry.rm()
+
+    for _ in entries:
+        get_stats().expect(0)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(remove, entries))
+    return RmSummary(len(entries), 0, sum(entry.size() for entry in entries))
+
+
+def do_rm_r(
+    context: RequestContext,
+    source: DriveEntry,
+    jobs: int = DEFAULT_JOBS,
+    dry_run: bool = False,
+) -> RmSummary:
+    """
+    Delete everything inside source, or source itself if it is a file. The
+    tree is listed concurrently and files are deleted as they are found; the
+    directories below source are deleted once they are empty, deepest first.
+    """
+    if not source.isdir():
+        return remove_entries([source], jobs, dry_run)
+
+    logger.info(f"Deleting all content for directory '{source.name()}'")
+
+    def remove(item: WalkItem):
+        logger.info(f"{'Would delete' if dry_run else 'Deleting'} {source.name()}/{item.path}")
+        with get_stats().file(item.path, 0):
+            if not dry_run:
+                item.entry.rm()
+
+    files = 0
+    size = 0
+    dirs: Dict[int, List[WalkItem]] = defaultdict(list)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        removals: List[Future] = []
+        for item in walk([source], jobs):
+            get_stats().expect(0)
+            if item.entry.isdir():
+                dirs[item.depth].append(item)
+                continue
+            files += 1
+            size += item.entry.size()
+            removals.append(pool.submit(remove, item))
+
+        # surface the first failure once every file has been attempted
+        for removal in removals:
+            removal.result()
+
+        for depth in sorted(dirs.keys(), reverse=True):
+            list(pool.map(remove, dirs[depth]))
+
+    if files == 0 and len(dirs) == 0:
+        logger.info(f"Nothing to delete: '{source.name()}' is already empty")
+
+    return RmSummary(files, sum(len(items) for items in dirs.values()), size)
+
+
+def log_summary(summary: RmSummary, dry_run: bool):
+    verb = "Would delete" if dry_run else "Deleted"
+    logger.info(
+        f"{verb} {summary.files} files and {summary.dirs} directories ({format_size(summary.bytes)})"
+    )
 
 
 def parse_pattern(context: RequestContext, pattern: str) -> List[DriveEntry]:
@@ -68,6 +137,9 @@ def parse_pattern(context: RequestContext, pattern: str) -> List[DriveEntry]:
 def drive_rm(args: List[str]) -> bool:
     epilog = """Example:
     ul drive rm -profile us '050040d2-6a9e-344c-4dfa-93c18ad2bfaa:/Dataset upload folder/*'
+
+    Count what a recursive delete would remove, without deleting anything:
+    ul drive rm -profile us -r -dry-run '050040d2-6a9e-344c-4dfa-93c18ad2bfaa:/Dataset upload folder/*'
     """
 
     parser = ulcli.argparser.ArgumentParser(
@@ -77,6 +149,17 @@ def drive_rm(args: List[str]) -> bool:
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
     parser.add_argument("-r", help="recursively remove all subdirectories", action="store_true")
+    parser.add_argument(
+        "-j",
+        help=f"number of entries to list or delete concurrently. Defaults to {DEFAULT_JOBS}",
+        type=int,
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument(
+        "-dry-run",
+        help="report how many files, directories and bytes would be deleted, without deleting them",
+        action="store_true",
+    )
     parser.add_argument(
         "-start",
         help="Earliest last modified date of files to remove. Format: unix second or YYYY-MM-DD string (midnight local time)",
@@ -89,14 +172,18 @@ def drive_rm(args: List[str]) -> bool:
         type=str,
         default=None,
     )
+    add_stats_arguments(parser)
     parser.add_argument(
         "files",
         nargs="+",
         help="pattern of files/directories to remove. Please quote all wildcards",
     )
     # parse and validate args
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
     files = parsed.files
     logger.info(f"Gathering {files}")
 
@@ -115,17 +202,22 @@ def drive_rm(args: List[str]) -> bool:
     if earliest is not None and latest is not None and earliest > latest:
         raise ValueError("Earliest timestamp must be less than latest timestamp")
 
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
     # non‑empty directory & recursive
     # -> delete all content (files/sudirs)
     if parsed.r:
         if earliest is not None or latest is not None:
             raise Exception("-start and -end flags are not supported with recursive delete")
-        for entry in entries:
-            do_rm_r(context, entry)
+        with reporting(parsed):
+            summaries = [do_rm_r(context, entry, parsed.j, parsed.dry_run) for entry in entries]
+        log_summary(RmSummary(*[sum(counts) for counts in zip(*summaries)]), parsed.dry_run)
         return True
 
     # non-empty directory & non-recursive
     # -> delete only files, keep subdirs
+    files = []
     for entry in entries:
         if entry.isdir():
             logger.warning(
@@ -134,7 +226,9 @@ def drive_rm(args: List[str]) -> bool:
             continue
         if not timestamp_in_range(entry.time(), earliest, latest):
             continue
-        logger.info(f"Deleting {entry.name()}")
-        entry.rm()
+        files.append(entry)
 
+    with reporting(parsed):
+        summary = remove_entries(files, parsed.j, parsed.dry_run)
+    log_summary(summary, parsed.dry_run)
     return True
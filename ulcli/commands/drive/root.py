@@ -6,8 +6,10 @@ from typing import List
 from loguru import logger
 
 import ulcli.argparser
-from ulcli.commands.common import get_api_context
-from ulsdk.api.drive import get_root_id
+from .api import get_drive_context, get_root_id
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
 
 
 def drive_root(args: List[str]):
@@ -27,8 +29,11 @@ def drive_root(args: List[str]):
         "id",
         help="user or group UUID",
     )
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
     parsed = parser.parse_args(args)
-    context = get_api_context(parsed)
+    context = get_drive_context(parsed)
 
     root = get_root_id(context, parsed.id)
 
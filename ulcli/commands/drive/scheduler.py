@@ -0,0 +1,85 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Work-queue scheduler for running many file transfers concurrently
+"""
+
+import itertools
+import queue
+import threading
+from typing import Callable, List, Optional
+
+
+class TransferScheduler:
+    """
+    Runs submitted jobs on a fixed pool of worker threads. Jobs are started
+    largest first among those waiting, so that big files don't end up alone at
+    the tail of a long copy. Producers can keep submitting while earlier jobs
+    run; the first failure cancels everything that hasn't started yet and is
+    re-raised from join().
+
+    Usage:
+        with TransferScheduler(8) as scheduler:
+            for entry in entries:
+                scheduler.submit(entry.size(), lambda e=entry: copy(e))
+    """
+
+    def __init__(self, jobs: int):
+        if jobs < 1:
+            raise ValueError(f"Number of jobs must be at least 1, got {jobs}")
+        self._jobs = jobs
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "TransferScheduler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.cancel(exc)
+        self.join()
+
+    def start(self):
+        for _ in range(self._jobs):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, size: int, fn: Callable[[], None]):
+        self._queue.put((0, -size, next(self._seq), fn))
+
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def cancel(self, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._error is None:
+                self._error = error or Exception("Transfer cancelled")
+
+    def join(self):
+        # the sentinels sort after every real job
+        for _ in self._workers:
+            self._queue.put((1, 0, next(self._seq), None))
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+        if self._error is not None:
+            raise self._error
+
+    def _work(self):
+        while True:
+            _, _, _, fn = self._queue.get()
+            if fn is None:
+                return
+            if self.failed():
+                continue
+
+            try:
+                fn()
+            except BaseException as e:
+                self.cancel(e)
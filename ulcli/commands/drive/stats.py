@@ -0,0 +1,256 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Counters for a drive command run: files and bytes transferred, and the count
+and latency of the API requests made (recorded by api.py). While a command
+runs on a terminal they are shown as a live progress line on stderr, and
+-stats-json writes a summary of them when it finishes.
+"""
+
+import json
+import math
+import shutil
+import sys
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+from loguru import logger
+
+from .retry import get_budget
+from .utils import format_size
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest rank percentile of values, for p between 0 and 100"""
+    if len(values) == 0:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(p / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class TransferStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+        # files found to be at the destination already, so not transferred
+        self.skipped = 0
+        # totals of the work queued so far, for the ETA
+        self.expected_files = 0
+        self.expected_bytes = 0
+        # token -> [name, size, bytes transferred, start, skipped] of the files
+        # in progress; tokens are unique, where names needn't be
+        self._active: Dict[int, List[Any]] = {}
+        self._tokens = itertools.count()
+        # the token of the file transfer running on each thread
+        self._local = threading.local()
+        self._requests: Dict[str, int] = {}
+        self._failed_requests = 0
+        self._latencies: List[float] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def expect(self, size: int):
+        with self._lock:
+            self.expected_files += 1
+            self.expected_bytes += size
+
+    @contextmanager
+    def file(self, name: str, size: int) -> Iterator[int]:
+        """
+        Track the transfer of a file of size bytes, shown as name, while the
+        body runs. Yields its token, which is also current() on this thread.
+        """
+        with self._lock:
+            token = next(self._tokens)
+            self._active[token] = [name, size, 0, time.perf_counter(), False]
+        outer = self.current()
+        self._local.token = token
+        try:
+            yield token
+            with self._lock:
+                if self._active[token][4]:
+                    self.skipped += 1
+                    self.expected_files -= 1
+                    self.expected_bytes -= size
+                else:
+                    self.files += 1
+        finally:
+            self._local.token = outer
+            with self._lock:
+                self._active.pop(token, None)
+
+    def current(self) -> Optional[int]:
+        """Token of the file transfer running on this thread, if any"""
+        return getattr(self._local, "token", None)
+
+    def transferred(self, n: int, token: Optional[int] = None):
+        """Count n bytes sent for the transfer token (by default the current one)"""
+        with self._lock:
+            self.bytes += n
+            active = self._active.get(token if token is not None else self.current())
+            if active is not None:
+                active[2] += n
+
+    def skip(self):
+        """Record that the current file transfer found nothing to send"""
+        with self._lock:
+            active = self._active.get(self.current())
+            if active is not None:
+                active[4] = True
+
+    def request(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self._requests[name] = self._requests.get(name, 0) + 1
+            self._latencies.append(seconds)
+            if not ok:
+                self._failed_requests += 1
+
+    def progress_line(self) -> str:
+        with self._lock:
+            elapsed = max(self.elapsed(), 1e-6)
+            file_rate = self.files / elapsed
+            if self.expected_bytes > 0:
+                rate = self.bytes / elapsed
+                parts = [
+                    f"{format_size(self.bytes)}/{format_size(self.expected_bytes)}",
+                    f"{format_size(rate)}/s",
+                    f"{self.files}/{self.expected_files} files",
+                    f"{file_rate:.1f} files/s",
+                ]
+                seconds = (self.expected_bytes - self.bytes) / rate if rate > 0 else None
+            else:
+                # work without a size (rm, mv) is measured in items done
+                parts = [f"{self.files}/{self.expected_files} items", f"{file_rate:.1f} items/s"]
+                seconds = (self.expected_files - self.files) / file_rate if file_rate > 0 else None
+            if seconds is not None and seconds > 0:
+                parts.append(f"ETA {time.strftime('%H:%M:%S', time.gmtime(seconds))}")
+
+            now = time.perf_counter()
+            for name, size, done, start, _ in list(self._active.values()):
+                percent = f" {100 * done // size}%" if size > 0 else ""
+                parts.append(f"{name}{percent} {format_size(done / max(now - start, 1e-6))}/s")
+
+        return "  ".join(parts)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = self.elapsed()
+            p50 = percentile(self._latencies, 50)
+            p95 = percentile(self._latencies, 95)
+            return {
+                "wall_seconds": round(wall, 3),
+                "files": self.files,
+                "skipped_files": self.skipped,
+                "bytes": self.bytes,
+                "bytes_per_second": round(self.bytes / wall, 1) if wall > 0 else None,
+                "files_per_second": round(self.files / wall, 3) if wall > 0 else None,
+                "requests": sum(self._requests.values()),
+                "requests_by_call": dict(self._requests),
+                "failed_requests": self._failed_requests,
+                "retries": get_budget().used(),
+                "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+
+
+_stats = TransferStats()
+
+
+def configure_stats(stats: TransferStats):
+    global _stats
+    _stats = stats
+
+
+def get_stats() -> TransferStats:
+    return _stats
+
+
+class Progress:
+    """
+    Redraws a progress line on out while running, if out is a terminal. Log
+    records are written above the line meanwhile, so the two don't garble
+    each other.
+    """
+
+    INTERVAL = 0.5
+
+    def __init__(self, stats: TransferStats, out: TextIO = sys.stderr):
+        self._stats = stats
+        self._out = out
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._line = ""
+        self._sink: Optional[int] = None
+
+    def __enter__(self) -> "Progress":
+        if self._out.isatty():
+            # loguru's stderr handler would write over the line
+            logger.remove()
+            self._sink = logger.add(self._log, colorize=True)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            with self._lock:
+                self._out.write("\r\x1b[K")
+                self._out.flush()
+        if self._sink is not None:
+            logger.remove(self._sink)
+            logger.add(sys.stderr)
+
+    def _log(self, message: str):
+        with self._lock:
+            self._out.write("\r\x1b[K" + message + self._line)
+            self._out.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL):
+            width = shutil.get_terminal_size().columns
+            line = self._stats.progress_line()[: width - 1]
+            with self._lock:
+                self._line = line
+                self._out.write("\r\x1b[K" + line)
+                self._out.flush()
+
+
+def add_stats_arguments(parser):
+    parser.add_argument(
+        "-stats-json",
+        help="write a JSON summary of files, bytes, requests, retries and request latency to this file, or - for stdout",
+        default=None,
+    )
+
+
+@contextmanager
+def reporting(parsed) -> Iterator[TransferStats]:
+    """
+    Show progress while the body runs, then write the -stats-json summary,
+    whether or not the body succeeded.
+    """
+    stats = get_stats()
+    completed = False
+    try:
+        with Progress(stats):
+            yield stats
+        completed = True
+    finally:
+        if parsed.stats_json is not None:
+            summary = {"completed": completed, **stats.summary()}
+            if parsed.stats_json == "-":
+                print(json.dumps(summary))
+            else:
+                with open(parsed.stats_json, "w") as f:
+                    json.dump(summary, f, indent=2)
+                    f.write("\n")
@@ -0,0 +1,244 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import os
+import threading
+from typing import Dict, List
+from loguru import logger
+
+import ulcli.argparser
+from ulsdk.request_context import RequestContext
+
+from .api import get_drive_context
+from .cache import add_cache_arguments
+from .retry import add_retry_arguments
+from .tracing import add_trace_arguments
+from .cp import Entry, DriveEntry, LocalEntry, check_memory_arguments, parse_files
+from .scheduler import TransferScheduler
+from .transfer import ByteBudget, TransferOptions
+from .hashcache import HashCache
+from .journal import prune_journals
+from .rm import do_rm_r
+from .stats import add_stats_arguments, get_stats, reporting
+from .utils import parse_timestamp_arg, timestamp_in_range
+from .walk import DEFAULT_JOBS
+
+
+class SyncCounts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.copied = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+
+    def add(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+def is_changed(src: Entry, dest: Entry) -> bool:
+    # Drive times are when the entry was written, so a destination that is at
+    # least as new as the source (and the same size) is considered up to date.
+    return src.size() != dest.size() or src.time() > dest.time()
+
+
+def remove_tree(context: RequestContext, entry: Entry):
+    """Delete entry and, if it is a drive directory, everything inside it"""
+    if entry.isdir() and isinstance(entry, DriveEntry):
+        do_rm_r(context, entry, DEFAULT_JOBS)
+
+    assert isinstance(entry, (DriveEntry, LocalEntry))
+    entry.rm()
+
+
+def sync_file(src: Entry, dest_dir: Entry, existing: Entry | None, options: TransferOptions):
+    if existing is not None and isinstance(dest_dir, DriveEntry):
+        dest_dir.replace(src, src.name(), options)
+    else:
+        dest_dir.put(src, src.name(), options)
+
+    # give local copies the source time so that the next sync sees them as
+    # up to date
+    if isinstance(dest_dir, LocalEntry):
+        dest_path = os.path.join(dest_dir.path(), src.name())
+        os.utime(dest_path, (src.time(), src.time()))
+
+
+def do_sync(
+    context: RequestContext,
+    source: Entry,
+    dest: Entry,
+    delete: bool,
+    earliest: int | None = None,
+    latest: int | None = None,
+    options: TransferOptions = TransferOptions(),
+) -> SyncCounts:
+    counts = SyncCounts()
+
+    def copy(src: Entry, dest_dir: Entry, existing: Entry | None):
+        logger.info(f"{'Updating' if existing is not None else 'Copying'} {src.name()}")
+        with get_stats().file(src.name(), src.size()):
+            sync_file(src, dest_dir, existing, options)
+        counts.add("updated" if existing is not None else "copied")
+
+    def remove(entry: Entry):
+        logger.info(f"Deleting {entry.name()}")
+        remove_tree(context, entry)
+        counts.add("deleted")
+
+    with TransferScheduler(options.jobs) as scheduler:
+        pending = [(source, dest)]
+        while len(pending) > 0 and not scheduler.failed():
+            src_dir, dest_dir = pending.pop()
+            dest_entries: Dict[str, Entry] = {e.name(): e for e in dest_dir.collect()}
+
+            for src in src_dir.collect():
+                existing = dest_entries.pop(src.name(), None)
+
+                if src.isdir():
+                    if existing is None:
+                        pending.append((src, dest_dir.mkdir(src.name())))
+                    elif existing.isdir():
+                        pending.append((src, existing))
+                    else:
+                        logger.warning(
+                            f"Skipping directory {src.name()} because a file with the same name exists at the destination"
+                        )
+                    continue
+
+                if existing is not None and existing.isdir():
+                    logger.warning(
+                        f"Skipping file {src.name()} because a directory with the same name exists at the destination"
+                    )
+                    continue
+
+                if not timestamp_in_range(src.time(), earliest, latest):
+                    continue
+
+                if existing is not None and not is_changed(src, existing):
+                    counts.add("unchanged")
+                    continue
+
+                get_stats().expect(src.size())
+                scheduler.submit(
+                    src.size(),
+                    lambda src=src, dest_dir=dest_dir, existing=existing: copy(
+                        src, dest_dir, existing
+                    ),
+                )
+
+            if delete:
+                for extra in dest_entries.values():
+                    scheduler.submit(0, lambda extra=extra: remove(extra))
+
+    return counts
+
+
+def drive_sync(args: List[str]) -> bool:
+    description = "Incrementally copy a directory tree to or from the drive."
+
+    epilog = """Example:
+
+    ul drive sync -profile us ./exports '05006c77-e69f-893e-40d1-842b64c961a5:/Dataset upload folder/exports'
+
+Makes the destination directory match the source directory, one way. A file is
+copied if it is missing at the destination, or if its size differs or it was
+modified more recently than the destination copy. Unchanged files are skipped.
+With -delete, entries at the destination that don't exist in the source are
+removed.
+
+Paths use the same syntax as `ul drive cp`; both must be directories.
+"""
+
+    parser = ulcli.argparser.ArgumentParser(
+        prog="ul drive sync",
+        description=description,
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-delete",
+        help="delete destination entries that don't exist in the source",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        help="number of files to copy concurrently. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-start",
+        help="Earliest last modified date of files to sync. Format: unix second or YYYY-MM-DD string (midnight local time)",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "-end",
+        help="Latest last modified date of files to sync. Format: unix second or YYYY-MM-DD string (midnight local time)",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "-chunk-size",
+        help="megabytes per upload chunk. By default chunks are sized from the file size, measured upload rate and -max-memory",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-max-memory",
+        help="maximum megabytes of file data held in memory across all concurrent transfers. Unlimited by default",
+        type=int,
+        default=None,
+    )
+    add_stats_arguments(parser)
+    parser.add_argument("source", help="source directory")
+    parser.add_argument("dest", help="destination directory")
+
+    add_cache_arguments(parser)
+    add_retry_arguments(parser)
+    add_trace_arguments(parser)
+    parsed = parser.parse_args(args)
+    context = get_drive_context(parsed)
+
+    earliest = parse_timestamp_arg(parsed.start)
+    latest = parse_timestamp_arg(parsed.end)
+    if earliest is not None and latest is not None and earliest > latest:
+        raise Exception("Earliest timestamp must be less than latest timestamp")
+
+    if parsed.j < 1:
+        raise Exception("-j must be at least 1")
+
+    check_memory_arguments(parsed)
+
+    parsed_files = parse_files(context, [parsed.source, parsed.dest])
+    if len(parsed_files) != 2:
+        raise Exception("Expected a single source directory and a single destination directory")
+
+    source, dest = parsed_files
+    if not source.isdir():
+        raise Exception("Source must be a directory")
+    if not dest.isdir():
+        raise Exception("Destination must be a directory")
+
+    prune_journals()
+    with reporting(parsed):
+        counts = do_sync(
+            context,
+            source,
+            dest,
+            parsed.delete,
+            earliest,
+            latest,
+            TransferOptions(
+                jobs=parsed.j,
+                hash_cache=HashCache() if isinstance(source, LocalEntry) else None,
+                chunk_size=parsed.chunk_size * 1024 * 1024 if parsed.chunk_size else None,
+                memory=ByteBudget(parsed.max_memory * 1024 * 1024) if parsed.max_memory else None,
+            ),
+        )
+    logger.info(
+        f"Copied {counts.copied}, updated {counts.updated}, deleted {counts.deleted}, {counts.unchanged} unchanged"
+    )
+    return True
@@ -0,0 +1,115 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Trace of the drive API requests a command makes, written with -trace in the
+Chrome trace event format so it can be opened in Perfetto or chrome://tracing.
+Each request attempt is a complete ("X") event on the thread that made it,
+with the payload size and outcome in its args; retry backoff sleeps and file
+copies get events of their own.
+
+Events are written as they happen. The closing bracket is written when the
+trace is closed, but viewers also accept a trace cut short without it.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+
+import ulcli.argparser
+
+
+def add_trace_arguments(parser):
+    """Add the request trace argument to a drive command's parser"""
+    parser.add_argument(
+        "-trace",
+        default=ulcli.argparser.common_default("trace"),
+        help="write a Chrome trace event file of every drive API request to this path",
+    )
+
+
+class Tracer:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads: Set[int] = set()
+        self._first = True
+        self._f = open(path, "w")
+        self._f.write("[\n")
+
+    def _write(self, event: Dict[str, Any]):
+        self._f.write(("" if self._first else ",\n") + json.dumps(event))
+        self._first = False
+
+    def complete(self, name: str, cat: str, start: float, end: float, args: Dict[str, Any]):
+        """Record an event that ran from start to end, as time.perf_counter() values"""
+        thread = threading.current_thread()
+        with self._lock:
+            if self._f.closed:
+                return
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)
+                self._write(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self._pid,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self._write(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": round((start - self._start) * 1e6, 1),
+                    "dur": round((end - start) * 1e6, 1),
+                    "pid": self._pid,
+                    "tid": thread.ident,
+                    "args": args,
+                }
+            )
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.write("\n]\n")
+                self._f.close()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure_tracer(tracer: Optional[Tracer]):
+    """Trace to tracer from now on, closing the previous trace"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def span(name: str, cat: str, args: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.complete(name, cat, start, time.perf_counter(), args or {})
+
+
+atexit.register(configure_tracer, None)
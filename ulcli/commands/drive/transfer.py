@@ -0,0 +1,142 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Shared state and tuning knobs for drive transfers
+"""
+
+import math
+import threading
+from typing import NamedTuple, Optional
+
+from .hashcache import HashCache
+
+
+class ByteBudget:
+    """
+    Bounds the number of bytes held by in-flight work. acquire() blocks until
+    the requested amount fits under the limit; a single request larger than the
+    limit could never fit, and raises ValueError.
+    """
+
+    def __init__(self, limit: int):
+        if limit <= 0:
+            raise ValueError(f"Byte budget must be positive, got {limit}")
+        self._limit = limit
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def limit(self) -> int:
+        return self._limit
+
+    def acquire(self, n: int) -> int:
+        if n > self._limit:
+            raise ValueError(f"Can't hold {n} bytes within a budget of {self._limit}")
+        with self._cond:
+            self._cond.wait_for(lambda: self._used + n <= self._limit)
+            self._used += n
+        return n
+
+    def release(self, n: int):
+        with self._cond:
+            self._used -= n
+            self._cond.notify_all()
+
+
+class ThroughputMeter:
+    """Moving average of the upload rate of a single stream, in bytes per second"""
+
+    # samples smaller than this mostly measure request latency
+    MIN_SAMPLE = 1024 * 1024
+    WEIGHT = 0.3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rate: Optional[float] = None
+
+    def record(self, n: int, seconds: float):
+        if n < self.MIN_SAMPLE or seconds <= 0:
+            return
+        with self._lock:
+            rate = n / seconds
+            self._rate = rate if self._rate is None else self._rate + self.WEIGHT * (rate - self._rate)
+
+    def rate(self) -> Optional[float]:
+        with self._lock:
+            return self._rate
+
+
+# upload rate measured by every transfer in this process
+throughput = ThroughputMeter()
+
+
+class TransferOptions(NamedTuple):
+    # number of files transferred concurrently
+    jobs: int = 1
+    # number of chunks of a single file uploaded concurrently
+    chunk_parallelism: int = 1
+    # cap on the bytes of chunk data held by in-flight uploads of a single file;
+    # defaults to chunk_parallelism chunks
+    max_inflight: Optional[int] = None
+    # record uploads in the on-disk journal and resume interrupted ones
+    resume: bool = True
+    # cache of local file digests, used to avoid re-hashing unchanged files
+    hash_cache: Optional[HashCache] = None
+    # skip uploads whose content the destination is known to already have
+    skip_identical: bool = False
+    # size of upload chunks; chosen per file by choose_chunk_size when None
+    chunk_size: Optional[int] = None
+    # bounds the transfer data held in memory across all concurrent transfers
+    memory: Optional[ByteBudget] = None
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+MIN_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 512 * 1024 * 1024
+# files are split into at most this many chunks, if the chunk size allows it
+MAX_CHUNKS = 10000
+# automatically sized chunks take about this long to send at the measured rate
+TARGET_CHUNK_SECONDS = 10
+
+
+def _power_of_two_below(n: float) -> int:
+    return 2 ** int(math.log2(max(n, 1)))
+
+
+def max_chunk_size(options: TransferOptions) -> Optional[int]:
+    """Largest chunk every concurrent upload can hold one of within the memory budget"""
+    if options.memory is None:
+        return None
+    return options.memory.limit() // (options.jobs * options.chunk_parallelism)
+
+
+def choose_chunk_size(file_size: int, options: TransferOptions) -> int:
+    """
+    Chunk size to upload a file of file_size bytes with. Unless one was given
+    in options, chunks are sized to take TARGET_CHUNK_SECONDS at the measured
+    upload rate (DEFAULT_CHUNK_SIZE until there is one), large enough to keep
+    the file under MAX_CHUNKS chunks and small enough for max_chunk_size.
+    Sizes are always powers of two, so nearby rates give the same size; the
+    choice still depends on what was uploaded earlier in the process, so
+    callers should prefer the chunk size a file was hashed or journaled with.
+    """
+    if options.chunk_size is not None:
+        return options.chunk_size
+
+    rate = throughput.rate()
+    size = DEFAULT_CHUNK_SIZE if rate is None else _power_of_two_below(rate * TARGET_CHUNK_SECONDS)
+    size = max(size, _power_of_two_below(file_size / MAX_CHUNKS) * 2)
+    size = min(max(size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+    limit = max_chunk_size(options)
+    if limit is not None and size > limit:
+        size = _power_of_two_below(limit)
+
+    return size
+
+
+def inflight_limit(chunk_size: int, options: TransferOptions) -> int:
+    """Most bytes of chunk data a single upload holds at once"""
+    if options.chunk_parallelism <= 1:
+        # the next chunk is read while the previous one is sent
+        return 2 * chunk_size
+    return max(options.max_inflight or options.chunk_parallelism * chunk_size, chunk_size)
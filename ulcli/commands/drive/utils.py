@@ -40,3 +40,23 @@ def is_directory_entry_id(id: str) -> bool:
     except Exception:
         return False
     return id.startswith("0500")
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size_arg(arg: str | None) -> int | None:
+    if arg is None:
+        return None
+    match = re.fullmatch(r"(\d+)([KMGT]?)B?", arg.strip().upper())
+    if match is None:
+        raise ValueError(f"Invalid size: {arg}. Must be a number of bytes, optionally followed by K, M, G or T")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
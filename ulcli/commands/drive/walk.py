@@ -0,0 +1,71 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Concurrent traversal of drive directory trees. Directories are listed on a
+pool of workers, breadth first, and entries are yielded as soon as their
+directory listing arrives, so callers can start working on the top of a large
+tree while the rest of it is still being listed.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from .cp import DriveEntry
+
+DEFAULT_JOBS = 8
+
+
+class WalkItem(NamedTuple):
+    entry: DriveEntry
+    # the directory the entry was listed from
+    parent: DriveEntry
+    # the directory in roots the entry was found under
+    root: DriveEntry
+    # "/" separated path of the entry, relative to the directory walked from
+    path: str
+    # 1 for the entries directly inside the directory walked from
+    depth: int
+
+
+def walk(
+    roots: List[DriveEntry],
+    jobs: int = DEFAULT_JOBS,
+    max_depth: Optional[int] = None,
+    descend: Optional[Callable[[WalkItem], bool]] = None,
+) -> Iterator[WalkItem]:
+    """
+    Yield every entry below the directories in roots, listing up to jobs
+    directories at a time. Entries deeper than max_depth are neither listed
+    nor yielded, and neither are the contents of directories for which
+    descend returns False. The roots themselves are not yielded, and entries
+    of roots that aren't directories are skipped.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending: Dict[Future, WalkItem] = {}
+        for root in roots:
+            # with max_depth 0 there is nothing to yield, so nothing to list
+            if root.isdir() and (max_depth is None or max_depth > 0):
+                pending[pool.submit(root.collect)] = WalkItem(root, root, root, "", 0)
+
+        try:
+            while len(pending) > 0:
+                done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory = pending.pop(future)
+                    for child in future.result():
+                        path = child.name() if directory.depth == 0 else f"{directory.path}/{child.name()}"
+                        item = WalkItem(child, directory.entry, directory.root, path, directory.depth + 1)
+                        if max_depth is not None and item.depth > max_depth:
+                            continue
+                        yield item
+
+                        if (
+                            child.isdir()
+                            and (max_depth is None or item.depth < max_depth)
+                            and (descend is None or descend(item))
+                        ):
+                            pending[pool.submit(child.collect)] = item
+        finally:
+            # stop listing if the caller stopped iterating or a listing failed
+            for future in pending.keys():
+                future.cancel()
@@ -16,6 +16,7 @@ import ulcli.cmdparser
 from ulcli.commands.common import get_api_context
 from ulcli.commands import UlcliCommand
 from ulcli.internal.console import Console
+from ulcli.internal import transport
 from ulsdk.keys import Region
 from ulsdk.api_key_context import ApiKeyContext
 from ulsdk.request_context import RequestContext, File
@@ -113,7 +114,7 @@ class BearerTokenContext(RequestContext):
     ) -> bytes:
         headers = self._get_headers(bearer_token=self._token)
         url, path = self._build_api_string(path)
-        response = requests.get(url, headers=headers, params=params)
+        response = transport.request("GET", url, headers=headers, params=params)
         response.raise_for_status()
         return response.content
 
@@ -130,7 +131,7 @@ class BearerTokenContext(RequestContext):
             bearer_token=self._token, data=body, mimetype=mimetype
         )
         url, path = self._build_api_string(path)
-        response = requests.post(url, headers=headers, data=body)
+        response = transport.request("POST", url, headers=headers, data=body)
         response.raise_for_status()
         return response.content
 
@@ -150,7 +151,7 @@ class BearerTokenContext(RequestContext):
             bearer_token=self._token, data=body, mimetype=mimetype
         )
         url, path = self._build_api_string(path)
-        response = requests.put(url, headers=headers, data=body)
+        response = transport.request("PUT", url, headers=headers, data=body)
         response.raise_for_status()
         return response.content
 
@@ -230,7 +231,7 @@ def get_bearer_token(
         + ".onmicrosoft.com/oauth2/v2.0/token?"
     )
 
-    response = requests.post(endpoint, params=params)
+    response = transport.request("POST", endpoint, params=params)
     if response.status_code != 200:
         return None
 
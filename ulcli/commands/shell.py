@@ -0,0 +1,107 @@
+# Copyright (c), CommunityLogiq Software
+
+import argparse
+import shlex
+import sys
+import traceback
+
+import ulcli
+import ulcli.argparser
+from ulcli.commands.command import UlcliCommand
+from ulcli.commands.drive.retry import add_retry_arguments
+from ulcli.commands.drive.tracing import add_trace_arguments
+from ulcli.internal.console import Console
+
+EXIT_COMMANDS = ["exit", "quit"]
+
+
+def run_line(line: str) -> bool:
+    try:
+        tokens = shlex.split(line, comments=True)
+    except ValueError as e:
+        Console.error(f"ERROR: {e}")
+        return False
+
+    # allow lines to be pasted straight from a shell script
+    if len(tokens) > 0 and tokens[0] == "ul":
+        tokens = tokens[1:]
+
+    if len(tokens) == 0:
+        return True
+
+    command = tokens[0]
+    mapping = ulcli._get_command_to_module_mapping()
+    if command not in mapping or command == "shell":
+        Console.error(f'ERROR: Command "{command}" not recognized')
+        return False
+
+    # commands parse their arguments from sys.argv
+    saved_argv = sys.argv
+    sys.argv = ["ul"] + tokens
+    try:
+        instance = ulcli._instantiate_module(mapping[command])
+        return bool(instance.run())
+    except SystemExit as e:
+        # argparse exits after printing help or usage errors
+        return e.code is None or e.code == 0
+    except Exception:
+        Console.error(traceback.format_exc())
+        return False
+    finally:
+        sys.argv = saved_argv
+        sys.stdout.flush()
+
+
+class Shell(UlcliCommand):
+    __help__ = "run many commands in one process"
+
+    def __init__(self):
+        super().__init__("shell")
+
+    def run(self):
+        epilog = """Reads commands from stdin, one per line, and runs them in this process.
+Contexts and HTTP connections are reused from one command to the next,
+which avoids paying for startup and authentication on every command. Lines
+use shell quoting and may start with "ul"; "#" starts a comment and "exit"
+ends the session. -env, -region, -profile, -retry-budget and -trace given to
+the shell are the defaults of every command it runs.
+
+Example:
+    printf 'drive ls <guid>/*\\ndrive mkdir -parent <guid> new\\n' | ul shell -profile us
+"""
+
+        parser = ulcli.argparser.ArgumentParser(
+            prog="ul shell",
+            epilog=epilog,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        add_retry_arguments(parser)
+        add_trace_arguments(parser)
+        parsed = parser.parse_args(sys.argv[2:])
+
+        defaults = {name: getattr(parsed, name) for name in ulcli.argparser.COMMON_ARGUMENTS}
+        with ulcli.argparser.common_defaults(defaults):
+            return self._loop()
+
+    def _loop(self) -> bool:
+        interactive = sys.stdin.isatty()
+        success = True
+        while True:
+            if interactive:
+                try:
+                    line = input("ul> ")
+                except EOFError:
+                    print()
+                    break
+            else:
+                line = sys.stdin.readline()
+                if line == "":
+                    break
+
+            if line.strip() in EXIT_COMMANDS:
+                break
+
+            if not run_line(line):
+                success = False
+
+        return success
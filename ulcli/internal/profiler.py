@@ -0,0 +1,142 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Startup profiler behind the hidden `ul --profile-startup` flag. It records
+how long each top level package takes to import (excluding time spent
+importing other packages from it) and how long each stage of command
+dispatch takes, then reports both on stderr when the process exits. Since
+subcommands are imported lazily, imports made after the command has started
+running are included in the per-package breakdown.
+"""
+
+import importlib.abc
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# packages that are always listed in the report, even if they weren't imported
+WATCHED_PACKAGES = ["ulsdk", "flatbuffers", "pyarrow", "magic", "tabulate", "loguru", "requests"]
+
+# other packages are only listed individually if they take at least this long
+REPORT_THRESHOLD = 0.002
+
+
+def process_age() -> Optional[float]:
+    """Seconds since the interpreter process started, where the OS tells us"""
+    try:
+        with open("/proc/self/stat") as f:
+            # the process name may contain spaces, so split after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, name: str, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        # extension modules are loaded here rather than in exec_module
+        with self._profiler.importing(self._name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.importing(self._name):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self._profiler)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._age_at_start = process_age()
+        self._stages: List[Tuple[str, float]] = []
+        self._run_start: Optional[float] = None
+        self._imports: Dict[str, float] = defaultdict(float)
+        # (package, start, time spent in nested imports) of imports in progress
+        self._stack: List[List] = []
+        self._finder = _TimingFinder(self)
+
+    def install(self):
+        sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    @contextmanager
+    def importing(self, name: str):
+        frame = [name.partition(".")[0], time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self._imports[frame[0]] += elapsed - frame[2]
+            if len(self._stack) > 0:
+                self._stack[-1][2] += elapsed
+
+    def mark_run(self):
+        self._run_start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, time.perf_counter() - start))
+
+    def report(self):
+        def line(label: str, seconds: float):
+            sys.stderr.write(f"    {label: <40} {seconds * 1000:9.1f} ms\n")
+
+        end = time.perf_counter()
+        sys.stderr.write("startup profile:\n")
+        if self._age_at_start is not None:
+            line("interpreter start to ulcli.main", self._age_at_start)
+        for name, seconds in self._stages:
+            line(name, seconds)
+        if self._run_start is not None:
+            line("ulcli.main to command run", self._run_start - self._start)
+        line("ulcli.main to exit", end - self._start)
+
+        sys.stderr.write("\nimport time by package (excluding nested packages):\n")
+        packages = set(self._imports.keys()) | set(WATCHED_PACKAGES)
+        other = 0.0
+        for package in sorted(packages, key=lambda p: -self._imports.get(p, 0.0)):
+            seconds = self._imports.get(package, 0.0)
+            if package in WATCHED_PACKAGES or seconds >= REPORT_THRESHOLD:
+                line(package, seconds)
+            else:
+                other += seconds
+        line("(everything else)", other)
+        sys.stderr.flush()
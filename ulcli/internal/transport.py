@@ -0,0 +1,72 @@
+# Copyright (c), CommunityLogiq Software
+
+"""
+Shared HTTP transport. Requests made through it use a pooled keep-alive
+session, so that consecutive calls to the same host reuse connections instead
+of paying for a new TCP and TLS handshake each time. requests doesn't promise
+that a Session is safe to share between threads, so every thread gets its own.
+
+The pool size and timeouts can be tuned with the UL_HTTP_POOL_SIZE,
+UL_HTTP_CONNECT_TIMEOUT and UL_HTTP_READ_TIMEOUT environment variables.
+"""
+
+import os
+import threading
+from typing import Optional, Tuple
+
+import requests
+import requests.adapters
+import requests.api
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 300.0
+
+_local = threading.local()
+_lock = threading.Lock()
+_installed = False
+
+
+def pool_size() -> int:
+    return int(os.getenv("UL_HTTP_POOL_SIZE") or DEFAULT_POOL_SIZE)
+
+
+def timeout() -> Tuple[float, float]:
+    connect = float(os.getenv("UL_HTTP_CONNECT_TIMEOUT") or DEFAULT_CONNECT_TIMEOUT)
+    read = float(os.getenv("UL_HTTP_READ_TIMEOUT") or DEFAULT_READ_TIMEOUT)
+    return (connect, read)
+
+
+def get_session() -> requests.Session:
+    """The calling thread's session"""
+    session: Optional[requests.Session] = getattr(_local, "session", None)
+    if session is None:
+        size = pool_size()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+    return session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = timeout()
+    return get_session().request(method=method, url=url, **kwargs)
+
+
+def install():
+    """
+    Route the module level requests.get/post/put/... helpers through the
+    pooled sessions. ulsdk's request contexts use those helpers and can't be
+    given a session, so the drive commands, which make many calls in a row,
+    install this before making their first request. This affects every user
+    of the helpers in the process, so nothing else should call it.
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        requests.api.request = request
+        _installed = True